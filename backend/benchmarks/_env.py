@@ -0,0 +1,33 @@
+"""Shared setup for the benchmark scripts.
+
+Fills in throwaway values for the environment server.py validates on import
+and puts backend/ on sys.path. Real values already in the environment win,
+except DB_NAME: benchmarks empty and drop their database, so every run gets
+its own neuron_bench_* database whatever the shell points the app at.
+"""
+
+import os
+import sys
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+BENCH_DB_PREFIX = "neuron_bench_"
+os.environ["DB_NAME"] = f"{BENCH_DB_PREFIX}{uuid.uuid4().hex[:12]}"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ADMIN_PASSWORD", "bench-password")
+os.environ.setdefault("CORS_ORIGINS", "http://localhost:3000")
+os.environ.setdefault("RAZORPAY_KEY_ID", "rzp_test_bench")
+os.environ.setdefault("RAZORPAY_KEY_SECRET", "bench-razorpay-secret")
+os.environ.setdefault("PAYMENT_GATEWAY", "fake")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+async def drop_bench_database(client, name: str):
+    """Drop a database this module named; anything else is refused."""
+    if not name.startswith(BENCH_DB_PREFIX):
+        raise RuntimeError(f"Refusing to drop {name!r}: not a benchmark database")
+    await client.drop_database(name)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark: how long does `import server` take?
+
+    python backend/benchmarks/bench_import_time.py [--top 15] [--budget-ms 400]
+
+Runs the import in a fresh interpreter under `-X importtime` so nothing is
+already cached in sys.modules, then reports the wall time and the modules
+with the largest cumulative import cost. With --budget-ms the script exits
+non-zero when the import is slower than the budget, so it can gate CI.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import _env
+
+
+def parse_importtime(stderr):
+    """Yield (self_us, cumulative_us, module) from -X importtime output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header row
+        yield int(fields[0]), int(fields[1]), fields[2].strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=_env.BACKEND_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        sys.exit(result.returncode)
+
+    rows = list(parse_importtime(result.stderr))
+    total_ms = sum(self_us for self_us, _, _ in rows) / 1000
+    top = sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]
+
+    print(json.dumps({
+        "wall_ms": round(wall_ms, 1),
+        "import_total_ms": round(total_ms, 1),
+        "modules": len(rows),
+        "top_cumulative_ms": {name: round(cumulative / 1000, 1) for _, cumulative, name in top},
+    }, indent=2))
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"import took {total_ms:.0f} ms, budget is {args.budget_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
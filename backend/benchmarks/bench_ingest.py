@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Registration inserts/sec against a local mongod, with and without batching.
+
+    MONGO_URI=mongodb://localhost:27017 python backend/benchmarks/bench_ingest.py \\
+        [--rows 20000] [--concurrency 500] [--mongomock]
+
+Each mode starts from empty registrations, teams and jobs collections with
+the production indexes, then pushes `rows` registrations through
+`concurrency` concurrent submitters. Every mode does the same work as a
+sign-up, side effects included:
+
+    precheck  find_one on the email, then a direct insert (the original path)
+    direct    server.insert_registration with REGISTRATION_INGEST_MODE=direct
+    batched   server.insert_registration with REGISTRATION_INGEST_MODE=batched
+
+Runs in a throwaway neuron_bench_* database (see _env.py), dropped at the end.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import _env
+import server
+
+
+def make_registration(n: int) -> server.Registration:
+    return server.Registration(
+        registration_id=f"NEUBENCH{n:010d}",
+        full_name=f"Bench User {n}",
+        email=f"bench{n}@example.com",
+        phone="+91 9876543210",
+        college=f"College {n % 50}",
+        team_name=f"Team {n % 500}",
+    )
+
+
+async def reset():
+    for name in ("registrations", "teams", "jobs"):
+        await server.db[name].drop()
+    await server.ensure_indexes()
+
+
+async def drive(submit, rows: int, concurrency: int) -> float:
+    queue = iter(range(rows))
+
+    async def worker():
+        for n in queue:
+            await submit(make_registration(n))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def precheck(registration):
+    if await server.db.registrations.find_one({"email": registration.email}, {"_id": 1}):
+        raise RuntimeError(f"{registration.email} already registered")
+    await server.insert_registration(registration)
+
+
+async def run_mode(mode: str, rows: int, concurrency: int) -> dict:
+    await reset()
+    server.REGISTRATION_INGEST_MODE = "batched" if mode == "batched" else "direct"
+    consumer = asyncio.create_task(server.registration_ingest.run()) if mode == "batched" else None
+    try:
+        elapsed = await drive(precheck if mode == "precheck" else server.insert_registration, rows, concurrency)
+    finally:
+        if consumer:
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+    return {"seconds": round(elapsed, 3), "inserts_per_sec": round(rows / elapsed)}
+
+
+async def main(rows: int, concurrency: int, mongomock: bool):
+    if mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.use_client(AsyncMongoMockClient())
+    else:
+        server.connect_mongo()
+
+    try:
+        results = {mode: await run_mode(mode, rows, concurrency) for mode in ("precheck", "direct", "batched")}
+    finally:
+        if not mongomock:
+            await _env.drop_bench_database(server.client, server.DB_NAME)
+
+    rate = {mode: result["inserts_per_sec"] for mode, result in results.items()}
+    results["speedup"] = {
+        "direct_vs_precheck": round(rate["direct"] / rate["precheck"], 2),
+        "batched_vs_direct": round(rate["batched"] / rate["direct"], 2),
+    }
+    print(json.dumps({"rows": rows, "concurrency": concurrency, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock-motor instead of MONGO_URI")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.concurrency, args.mongomock))
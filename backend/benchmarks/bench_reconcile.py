@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Payment reconciler throughput and correctness against the fake gateway.
+
+    python backend/benchmarks/bench_reconcile.py [--orders 2000] [--paid 0.3] [--failed 0.1] \\
+        [--latency-ms 50] [--concurrency 8] [--rate 0] [--mongomock]
+
+Seeds pending registrations that each hold a fake order, records captured
+or failed payments for a share of them directly in the fake gateway (the
+"lost callback" case), then runs reconcile sweeps until a full pass is
+done. Reports sweeps, elapsed time, orders checked per second, and whether
+the resulting payment statuses match what was seeded. Runs in a fresh
+neuron_bench_* database (see _env.py) that is dropped afterwards.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--paid", type=float, default=0.3, help="share of orders captured out of band")
+    parser.add_argument("--failed", type=float, default=0.1, help="share of orders whose only attempt failed")
+    parser.add_argument("--latency-ms", type=int, default=50, help="fake gateway round trip")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0, help="gateway calls per second, 0 for unpaced")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock-motor instead of MONGO_URI")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ.setdefault("RECONCILE_INTERVAL_SECONDS", "0")  # sweeps are driven below
+os.environ.setdefault("RECONCILE_MIN_AGE_SECONDS", "0")
+os.environ.setdefault("RECONCILE_MAX_PER_RUN", str(10 ** 9))
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("GATEWAY_MAX_WORKERS", str(max(args.concurrency, 8)))
+os.environ["RECONCILE_CONCURRENCY"] = str(args.concurrency)
+os.environ["RECONCILE_RATE_PER_SECOND"] = str(args.rate)
+
+import _env  # noqa: E402
+import server  # noqa: E402
+
+
+async def seed(orders: int) -> dict:
+    gateway = server.payment_gateway
+    expected = {server.PAID_STATUS: 0, server.FAILED_STATUS: 0, server.PENDING_STATUS: 0}
+    created = datetime.now(timezone.utc) - timedelta(hours=1)
+    docs = []
+    for n in range(orders):
+        order = gateway.create_order({"amount": 50000, "currency": "INR"})
+        roll = random.random()
+        if roll < args.paid:
+            gateway.record_payment(order["id"], "captured")
+            expected[server.PAID_STATUS] += 1
+        elif roll < args.paid + args.failed:
+            gateway.record_payment(order["id"], "failed")
+            expected[server.FAILED_STATUS] += 1
+        else:
+            expected[server.PENDING_STATUS] += 1
+        registration = server.Registration(
+            registration_id=f"NEUBENCH{n:010d}",
+            full_name=f"Bench User {n}",
+            email=f"bench{n}@example.com",
+            phone="+91 9876543210",
+            college=f"College {n % 50}",
+            order_id=order["id"],
+            amount=50000,
+            created_at=created + timedelta(milliseconds=n),
+        )
+        docs.append(registration.model_dump())
+    await server.db.registrations.insert_many(docs)
+    return expected
+
+
+async def main():
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.use_client(AsyncMongoMockClient())
+
+    async with server.app.router.lifespan_context(server.app):
+        try:
+            expected = await seed(args.orders)
+            server.payment_gateway.latency = args.latency_ms / 1000
+
+            sweeps = checked = 0
+            start = time.perf_counter()
+            while True:
+                result = await server.payment_reconciler.sweep()
+                sweeps += 1
+                checked += result.get("checked", 0)
+                if not result.get("resume"):
+                    break
+            elapsed = time.perf_counter() - start
+
+            actual = {
+                status: await server.db.registrations.count_documents({"payment_status": status})
+                for status in expected
+            }
+        finally:
+            if not args.mongomock:
+                await _env.drop_bench_database(server.client, server.DB_NAME)
+
+    print(json.dumps({
+        "orders": args.orders,
+        "latency_ms": args.latency_ms,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "sweeps": sweeps,
+        "checked": checked,
+        "seconds": round(elapsed, 3),
+        "orders_per_sec": round(checked / elapsed, 1) if elapsed else None,
+        "expected": expected,
+        "actual": actual,
+        "correct": actual == expected,
+    }, indent=2))
+    return actual == expected
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
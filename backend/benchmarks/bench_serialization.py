@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Serialization cost of a registration list page, per REGISTRATION_SERIALIZER mode.
+
+    python backend/benchmarks/bench_serialization.py [--rows 1000 10000 100000] [--repeat 3]
+
+No database is needed. Rows are shaped like Motor returns them (naive
+datetimes, `_id` projected out). "model" runs FastAPI's own response_model
+path (validate, serialize, json.dumps), the others call the fast-path
+encoder the route uses. "projected" encodes the dashboard's field subset.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import _env  # noqa: F401
+import server
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+DASHBOARD_FIELDS = "registration_id,full_name,email,college,team_name,payment_status,order_id,created_at"
+
+
+def make_rows(count: int) -> List[dict]:
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "id": f"00000000-0000-0000-0000-{n:012d}",
+            "registration_id": f"NEUBENCH{n:010d}",
+            "full_name": f"Bench User {n}",
+            "email": f"bench{n}@example.com",
+            "phone": "+91 9876543210",
+            "college": f"College {n % 50}",
+            "team_name": f"Team {n % 500}",
+            "payment_status": "completed" if n % 3 else "pending",
+            "transaction_id": f"pay_{n:014d}" if n % 3 else None,
+            "order_id": f"order_{n:014d}",
+            "amount": 50000,
+            "created_at": start + timedelta(milliseconds=n),
+            "checked_in_at": None,
+        }
+        for n in range(count)
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    field = create_response_field(name="Response_Get_Registrations", type_=List[server.Registration])
+    selected = server.parse_fields(DASHBOARD_FIELDS)
+
+    def model_path(page):
+        content = asyncio.run(serialize_response(field=field, response_content=page))
+        return JSONResponse(content).body
+
+    results = []
+    for count in args.rows:
+        page = make_rows(count)
+        projected = [{key: row[key] for key in selected} for row in page]
+        modes = {
+            "model": lambda: model_path(page),
+            "validated": lambda: server.registration_list_body(page, False, "validated"),
+            "trusted": lambda: server.registration_list_body(page, False, "trusted"),
+            "projected": lambda: server.registration_list_body(projected, True),
+        }
+        timings = {mode: timed(fn, args.repeat) for mode, fn in modes.items()}
+        results.append({
+            "rows": count,
+            "ms": {mode: round(seconds * 1000, 1) for mode, seconds in timings.items()},
+            "speedup_vs_model": {
+                mode: round(timings["model"] / seconds, 1)
+                for mode, seconds in timings.items() if mode != "model"
+            },
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Local load test: per-endpoint latency percentiles and throughput as JSON.
+
+    # in-process over ASGI against a local mongod
+    python backend/benchmarks/load_test.py --requests 500 --concurrency 50
+
+    # in-process with no database at all (pip install mongomock-motor)
+    python backend/benchmarks/load_test.py --mongomock
+
+    # against a running uvicorn/gunicorn deployment
+    python backend/benchmarks/load_test.py --base-url http://127.0.0.1:8001
+
+Razorpay is always the in-memory fake gateway when running in-process. Login
+throttling is lifted so the login scenario measures bcrypt, not 429s.
+In-process runs use a fresh neuron_bench_* database (see _env.py), never the
+app's DB_NAME, and drop it afterwards unless --keep-data is given.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+import uuid
+
+# Every simulated client shares one IP, so the per-IP limits are lifted.
+os.environ.setdefault("LOGIN_MAX_ATTEMPTS", str(10 ** 9))
+os.environ.setdefault("RATE_LIMIT_IP_PER_MINUTE", str(10 ** 9))
+os.environ.setdefault("RATE_LIMIT_IP_BURST", str(10 ** 9))
+
+import _env  # noqa: E402
+import httpx  # noqa: E402
+
+ORDER_AMOUNT = 50000
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000, 2)  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "errors": sum(1 for s in statuses if s >= 400),
+        "status_codes": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+
+async def run_scenario(make_request, total, concurrency):
+    """Fire `total` requests from `concurrency` workers; return a summary."""
+    latencies, statuses = [], []
+    counter = iter(range(total))
+
+    async def worker():
+        for n in counter:
+            start = time.perf_counter()
+            response = await make_request(n)
+            latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+async def run(http, args):
+    run_id = uuid.uuid4().hex[:8]
+    password = os.environ["ADMIN_PASSWORD"]
+    registrations = []
+    results = {}
+
+    async def register(n):
+        response = await http.post("/api/registrations", json={
+            "full_name": f"Load User {n}",
+            "email": f"load-{run_id}-{n}@example.com",
+            "phone": "+91 9876543210",
+            "college": f"College {n % 50}",
+            "team_name": f"Team {n % 200}",
+        })
+        if response.status_code == 200:
+            registrations.append(response.json())
+        return response
+
+    async def login(_):
+        return await http.post("/api/auth/admin-login", json={"username": "admin", "password": password})
+
+    results["register"] = await run_scenario(register, args.requests, args.concurrency)
+    results["login"] = await run_scenario(login, args.login_requests, args.concurrency)
+
+    token_response = await login(0)
+    token_response.raise_for_status()
+    headers = {"Authorization": f"Bearer {token_response.json()['access_token']}"}
+
+    async def list_page(_):
+        return await http.get("/api/registrations", params={"limit": 100}, headers=headers)
+
+    async def export(_):
+        return await http.get("/api/registrations/export", headers=headers)
+
+    async def create_order(n):
+        reg = registrations[n % len(registrations)]
+        return await http.post("/api/payment/create-order", json={
+            "amount": ORDER_AMOUNT,
+            "registration_id": reg["registration_id"],
+            "full_name": reg["full_name"],
+            "email": reg["email"],
+            "phone": reg["phone"],
+        })
+
+    results["list"] = await run_scenario(list_page, args.requests, args.concurrency)
+    results["export"] = await run_scenario(export, args.export_requests, args.concurrency)
+    if registrations:
+        results["create_order"] = await run_scenario(create_order, args.requests, args.concurrency)
+    return results
+
+
+async def main(args):
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as http:
+            return await run(http, args)
+
+    import server
+
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.use_client(AsyncMongoMockClient())
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+            try:
+                return await run(http, args)
+            finally:
+                if args.keep_data and not args.mongomock:
+                    print(f"Kept database {server.DB_NAME}", file=sys.stderr)
+                elif not args.mongomock:
+                    await _env.drop_bench_database(server.client, server.DB_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock-motor instead of MONGO_URI")
+    parser.add_argument("--keep-data", action="store_true", help="keep the neuron_bench_* database after an in-process run")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--login-requests", type=int, default=50, help="login requests (bcrypt bound)")
+    parser.add_argument("--export-requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    report = {
+        "target": args.base_url or ("asgi+mongomock" if args.mongomock else "asgi+mongo"),
+        "concurrency": args.concurrency,
+        "endpoints": asyncio.run(main(args)),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Local SMTP stand-in that accepts and counts mail without delivering it.
+
+    python backend/benchmarks/smtp_sink.py [--port 2525] [--latency-ms 200] [--fail-rate 0.1]
+
+Point the backend at it with SMTP_HOST=localhost SMTP_PORT=2525
+SMTP_STARTTLS=false, then watch the job queue drain. --latency-ms delays
+every reply to mimic a slow relay; --fail-rate answers that share of
+messages with a 451 so retries and backoff get exercised. Prints a JSON
+line with totals every few seconds.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+stats = {"connections": 0, "accepted": 0, "rejected": 0}
+
+
+class SinkSession:
+    def __init__(self, reader, writer, latency: float, fail_rate: float):
+        self.reader = reader
+        self.writer = writer
+        self.latency = latency
+        self.fail_rate = fail_rate
+
+    async def reply(self, line: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.writer.write(line.encode() + b"\r\n")
+        await self.writer.drain()
+
+    async def read_data(self):
+        while True:
+            line = await self.reader.readline()
+            if not line or line.rstrip(b"\r\n") == b".":
+                return
+
+    async def run(self):
+        await self.reply("220 smtp-sink ready")
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            verb = line.decode(errors="replace").strip().split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                await self.reply("250-smtp-sink\r\n250 8BITMIME")
+            elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                await self.reply("250 OK")
+            elif verb == "DATA":
+                await self.reply("354 End data with <CR><LF>.<CR><LF>")
+                await self.read_data()
+                if random.random() < self.fail_rate:
+                    stats["rejected"] += 1
+                    await self.reply("451 Try again later")
+                else:
+                    stats["accepted"] += 1
+                    await self.reply("250 Queued")
+            elif verb == "QUIT":
+                await self.reply("221 Bye")
+                return
+            else:
+                await self.reply("502 Command not implemented")
+
+
+async def report(interval: float):
+    start = time.perf_counter()
+    while True:
+        await asyncio.sleep(interval)
+        elapsed = time.perf_counter() - start
+        print(json.dumps({
+            **stats,
+            "elapsed_s": round(elapsed, 1),
+            "accepted_per_s": round(stats["accepted"] / elapsed, 1),
+        }), flush=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--report-every", type=float, default=5.0)
+    args = parser.parse_args()
+
+    async def handle(reader, writer):
+        stats["connections"] += 1
+        try:
+            await SinkSession(reader, writer, args.latency_ms / 1000, args.fail_rate).run()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, args.host, args.port)
+    print(f"smtp sink listening on {args.host}:{args.port}", flush=True)
+    async with server:
+        await asyncio.gather(server.serve_forever(), report(args.report_every))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+"""Gunicorn profile for running the API with several uvicorn workers.
+
+    cd backend && gunicorn -c gunicorn.conf.py server:app
+
+Each worker opens its own Mongo pool in the startup hook, so the cluster sees
+up to WEB_CONCURRENCY * MONGO_MAX_POOL_SIZE connections; size both together.
+Set REGISTRATION_ID_WORKER per worker only if host+pid hashing is not enough.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8001")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# server.py creates its Mongo client after fork, so preloading is safe and
+# lets workers share the imported code pages.
+preload_app = True
+
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks can't accumulate over event day.
+max_requests = int(os.getenv("MAX_REQUESTS", "20000"))
+max_requests_jitter = 2000
+
+accesslog = "-"
+
+# Proxies whose X-Forwarded-For is trusted for request.client. Behind an
+# ingress or load balancer set this to its address(es), comma-separated, or
+# "*" when only the proxy can reach the workers. Per-IP limits in server.py
+# stay off until RATE_LIMIT_BY_IP=true, since with the default every visitor
+# appears to come from the proxy.
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s forked; Mongo client will be created in its startup hook", worker.pid)
@@ -1,18 +1,39 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReadPreference, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
 import logging
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, TypeAdapter, ValidationError, model_validator
+from typing import Deque, Dict, List, Optional, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
-import razorpay
 import bcrypt
 import jwt
 import csv
+import codecs
 import io
+import base64
+import zlib
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import random
+import secrets
+import threading
+import hashlib
+import hmac
+import json
+import re
+import orjson
+import socket
+import smtplib
+from email.message import EmailMessage
+from contextlib import asynccontextmanager
 
 # -------------------------------------------------------------------
 # ENVIRONMENT VALIDATION
@@ -41,12 +62,333 @@ missing = [
 if missing:
     raise RuntimeError(f"Missing environment variables: {', '.join(missing)}")
 
+# -------------------------------------------------------------------
+# METRICS
+# -------------------------------------------------------------------
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # when set, /api/metrics requires it as a bearer token
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: str):
+        self.values[labels] = value
+
+    def inc(self, amount: float = 1, *labels: str):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, *labels: str):
+        self.inc(-amount, *labels)
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(self.labels, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: one count per bucket (non-cumulative), then sum, then count.
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, labels, le=bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(self.labels, labels, le='+Inf')} {series[-1]}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {series[-1]}")
+        return lines
+
+HTTP_LATENCY = Histogram(
+    "neuron_http_request_duration_seconds", "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+HTTP_IN_FLIGHT = Gauge("neuron_http_requests_in_flight", "HTTP requests currently being served.")
+DB_LATENCY = Histogram(
+    "neuron_mongo_operation_duration_seconds", "Motor operation latency.",
+    ("collection", "operation"),
+)
+GATEWAY_LATENCY = Histogram(
+    "neuron_gateway_call_duration_seconds", "Payment gateway call latency per attempt.",
+    ("method", "outcome"),
+)
+LOOP_LAG = Gauge("neuron_event_loop_lag_seconds", "Most recent event loop scheduling delay.")
+LOOP_LAG_HISTOGRAM = Histogram("neuron_event_loop_lag_distribution_seconds", "Event loop scheduling delay.")
+QUEUE_DEPTH = Gauge("neuron_queue_depth", "Items waiting in in-process batch queues.", ("queue",))
+
+METRICS = [HTTP_LATENCY, HTTP_IN_FLIGHT, DB_LATENCY, GATEWAY_LATENCY, LOOP_LAG, LOOP_LAG_HISTOGRAM, QUEUE_DEPTH]
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording in-flight requests and latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope, so latency is
+            # grouped by path template rather than by raw URL.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_LATENCY.observe(time.perf_counter() - start, scope["method"], route, str(status))
+
+# Motor operations that are timed individually; find/aggregate are timed
+# when their cursor is drained with to_list().
+TIMED_OPERATIONS = {
+    "find_one", "find_one_and_update", "find_one_and_delete", "insert_one", "insert_many",
+    "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "bulk_write", "count_documents", "distinct", "index_information", "create_indexes", "drop",
+}
+
+def timed_operation(method, collection: str, operation: str):
+    async def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - start, collection, operation)
+    return call
+
+class TimedCursor:
+    """Wraps a Motor cursor so to_list() is timed; chaining keeps the wrapper."""
+
+    def __init__(self, cursor, collection: str, operation: str):
+        self._cursor = cursor
+        self._collection = collection
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return chained
+
+    def __aiter__(self):
+        return self._cursor.__aiter__()
+
+    async def to_list(self, length):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.to_list(length)
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - start, self._collection, f"{self._operation}.to_list")
+
+class TimedCollection:
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in TIMED_OPERATIONS:
+            return timed_operation(attr, self.name, name)
+        if name in ("find", "aggregate"):
+            return lambda *args, **kwargs: TimedCursor(attr(*args, **kwargs), self.name, name)
+        if name == "with_options":
+            return lambda *args, **kwargs: TimedCollection(attr(*args, **kwargs))
+        return attr
+
+class TimedDatabase:
+    """Database proxy whose collections record DB_LATENCY per operation."""
+
+    def __init__(self, database):
+        self._database = database
+        self._collections: Dict[str, TimedCollection] = {}
+
+    def __getitem__(self, name: str) -> TimedCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = TimedCollection(self._database[name])
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._database, name)
+        if callable(getattr(attr, "find_one", None)):
+            return self[name]
+        return attr
+
 # -------------------------------------------------------------------
 # DATABASE
 # -------------------------------------------------------------------
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,zlib"
+# Admin list/export/stats reads can go to secondaries, e.g. "secondaryPreferred".
+MONGO_ADMIN_READ_PREFERENCE = os.getenv("MONGO_ADMIN_READ_PREFERENCE", "primary")
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+# The client is created per process in the startup hook, never at import:
+# a Motor client must not cross a fork, which a preloading process manager
+# would otherwise do. Pool limits are per worker.
+client: Optional[AsyncIOMotorClient] = None
+client_pid: Optional[int] = None
+db: Optional[TimedDatabase] = None
+admin_db: Optional[TimedDatabase] = None
+
+def mongo_client_options() -> dict:
+    options = {
+        "appname": "neuron-backend",
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+def use_client(new_client):
+    """Point the module at a client (and this process) for all later calls."""
+    global client, client_pid, db, admin_db
+    client = new_client
+    client_pid = os.getpid()
+
+    database = new_client[DB_NAME]
+    db = TimedDatabase(database)
+
+    read_preference = READ_PREFERENCES[MONGO_ADMIN_READ_PREFERENCE]
+    if read_preference == ReadPreference.PRIMARY:
+        admin_db = db
+    else:
+        admin_db = TimedDatabase(database.with_options(read_preference=read_preference))
+
+def connect_mongo():
+    if client is not None and client_pid == os.getpid():
+        return
+    use_client(AsyncIOMotorClient(MONGO_URI, **mongo_client_options()))
+
+# -------------------------------------------------------------------
+# INDEXES
+# -------------------------------------------------------------------
+
+# Declared indexes per collection, ensured on startup by ensure_indexes().
+INDEXES = {
+    "registrations": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("registration_id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("order_id", ASCENDING)]),
+        # Admin list filters, each followed by the keyset sort.
+        IndexModel([("payment_status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("college", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("full_name", TEXT), ("email", TEXT), ("team_name", TEXT)]),
+        IndexModel([("team_key", ASCENDING)]),
+    ],
+    "registrations_archive": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("registration_id", ASCENDING)], unique=True),
+    ],
+    "teams": [
+        IndexModel([("team_key", ASCENDING)], unique=True),
+        # "Teams with unpaid members" walks this in team_key order: the
+        # partial filter holds only those teams, so nothing is sorted in
+        # memory. unpaid_count is in the key only so it does not repeat the
+        # unique index's key pattern, which older servers refuse.
+        IndexModel(
+            [("team_key", ASCENDING), ("unpaid_count", ASCENDING)],
+            name="team_key_unpaid",
+            partialFilterExpression={"unpaid_count": {"$gt": 0}},
+        ),
+    ],
+    "admins": [
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    "revoked_tokens": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "event_tickets": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "jobs": [
+        IndexModel([("dedupe_key", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)]),
+        # Only finished jobs get expires_at; dead ones stay for inspection.
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+# Index options compared against the live index when reporting drift.
+INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
 
 # -------------------------------------------------------------------
 # JWT CONFIG
@@ -55,20 +397,500 @@ db = client[DB_NAME]
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
+# bcrypt costs 100-300ms of CPU per call, so it runs on its own small pool.
+HASH_MAX_WORKERS = int(os.getenv("HASH_MAX_WORKERS", "2"))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "16"))
+# Failed logins past LOGIN_MAX_ATTEMPTS within the window lock out that
+# username from that client IP. Without per-IP keys a username is never
+# locked out (anyone could lock out the admin); each further failure
+# doubles a delay before the password is checked, up to LOGIN_DELAY_MAX_SECONDS.
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", "5"))
+LOGIN_WINDOW_SECONDS = int(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+LOGIN_DELAY_MAX_SECONDS = int(os.getenv("LOGIN_DELAY_MAX_SECONDS", "30"))
+LOGIN_TRACKED_KEYS_MAX = 10000
+
+# Verified tokens are cached per worker; a revocation made on another worker
+# is picked up once the cached entry ages out after TOKEN_CACHE_TTL_SECONDS.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "256"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+
+# -------------------------------------------------------------------
+# REGISTRATION INGEST
+# -------------------------------------------------------------------
+
+# "direct" inserts each registration on its own; "batched" coalesces
+# concurrent sign-ups into insert_many calls for launch-time bursts.
+REGISTRATION_INGEST_MODE = os.getenv("REGISTRATION_INGEST_MODE", "direct")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+INGEST_BATCH_WAIT_MS = int(os.getenv("INGEST_BATCH_WAIT_MS", "20"))
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "20000"))
+
+# -------------------------------------------------------------------
+# RATE LIMITS
+# -------------------------------------------------------------------
+
+# Token buckets for the public write endpoints: each key refills at
+# *_PER_MINUTE tokens a minute and holds at most *_BURST. "memory" keeps
+# buckets per worker; "mongo" shares them across workers and hosts.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Per-IP keys (rate limits and the login throttle's ip: key) are opt-in:
+# behind a proxy they only make sense once FORWARDED_ALLOW_IPS lets the
+# server see real client addresses, otherwise every visitor shares one key.
+RATE_LIMIT_BY_IP = os.getenv("RATE_LIMIT_BY_IP", "false").lower() == "true"
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "60"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "30"))
+RATE_LIMIT_KEY_PER_MINUTE = float(os.getenv("RATE_LIMIT_KEY_PER_MINUTE", "6"))
+RATE_LIMIT_KEY_BURST = int(os.getenv("RATE_LIMIT_KEY_BURST", "3"))
+RATE_LIMIT_TRACKED_KEYS_MAX = 50000
+
+# Load shedding: public write endpoints answer 503 straight away while the
+# worker is this busy. 0 disables a check.
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "500"))
+SHED_MAX_LOOP_LAG_SECONDS = float(os.getenv("SHED_MAX_LOOP_LAG_SECONDS", "0.5"))
+SHED_RETRY_AFTER_SECONDS = 5
+
+# -------------------------------------------------------------------
+# REGISTRATION IDS
+# -------------------------------------------------------------------
+
+REGISTRATION_ID_PREFIX = "NEU"
+REGISTRATION_ID_SCHEME = os.getenv("REGISTRATION_ID_SCHEME", "snowflake")  # "snowflake" or "random"
+REGISTRATION_ID_WORKER = os.getenv("REGISTRATION_ID_WORKER")  # 0-1023, unique per worker process
+# Without REGISTRATION_ID_WORKER each worker leases a free id from the
+# id_workers collection at startup and renews it every third of the lease.
+REGISTRATION_ID_LEASE_SECONDS = int(os.getenv("REGISTRATION_ID_LEASE_SECONDS", "300"))
+REGISTRATION_ID_WORKERS = 1024
+REGISTRATION_ID_ATTEMPTS = 3
+ID_EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+def encode_crockford(value: int, width: int) -> str:
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+class RandomIdGenerator:
+    """The original scheme: NEU + local date + 8 random hex chars."""
+
+    def __call__(self) -> str:
+        return f"{REGISTRATION_ID_PREFIX}{datetime.now().strftime('%Y%m%d')}{uuid.uuid4().hex[:8].upper()}"
+
+class SnowflakeIdGenerator:
+    """Time-ordered ids: NEU + UTC date + 13 Crockford base32 characters.
+
+    The base32 part encodes 42 bits of milliseconds since ID_EPOCH_MS,
+    10 bits of worker id and a 12-bit per-millisecond sequence, so ids sort
+    lexicographically in creation order and two workers with different ids
+    can never collide. The worker id comes from REGISTRATION_ID_WORKER or a
+    lease (WorkerIdLease); until a lease is held, or after a fork, it is
+    hashed from host and pid, and a clash is caught by the unique index.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None, clock=time.time):
+        self.configured_worker = worker_id
+        self.leased_worker: Optional[Tuple[int, int]] = None  # (worker id, pid)
+        self.clock = clock
+        self.pid = None
+        self.worker_id = 0
+        self.last_ms = -1
+        self.sequence = 0
+        self._lock = threading.Lock()
+
+    def use_worker(self, worker_id: Optional[int]):
+        """Switch this process to a leased worker id; None goes back to the hashed one."""
+        with self._lock:
+            self.leased_worker = (worker_id, os.getpid()) if worker_id is not None else None
+            self.pid = None
+
+    def _derive_worker(self):
+        self.pid = os.getpid()
+        if self.configured_worker is not None:
+            self.worker_id = self.configured_worker & 0x3FF
+        elif self.leased_worker is not None and self.leased_worker[1] == self.pid:
+            self.worker_id = self.leased_worker[0]
+        else:
+            digest = hashlib.sha256(f"{socket.gethostname()}:{self.pid}".encode()).digest()
+            self.worker_id = int.from_bytes(digest[:2], "big") & 0x3FF
+
+    def __call__(self) -> str:
+        with self._lock:
+            if self.pid != os.getpid():
+                self._derive_worker()
+
+            now = max(int(self.clock() * 1000), self.last_ms)  # never step back with the clock
+            if now == self.last_ms:
+                self.sequence = (self.sequence + 1) & 0xFFF
+                if self.sequence == 0:
+                    now += 1  # sequence exhausted: borrow the next millisecond
+            else:
+                self.sequence = 0
+            self.last_ms = now
+            value = ((now - ID_EPOCH_MS) << 22) | (self.worker_id << 12) | self.sequence
+
+        date = datetime.fromtimestamp(now / 1000, timezone.utc).strftime("%Y%m%d")
+        return f"{REGISTRATION_ID_PREFIX}{date}{encode_crockford(value, 13)}"
+
+ID_GENERATORS = {
+    "snowflake": lambda: SnowflakeIdGenerator(
+        int(REGISTRATION_ID_WORKER) if REGISTRATION_ID_WORKER else None
+    ),
+    "random": RandomIdGenerator,
+}
+
+new_registration_id = ID_GENERATORS[REGISTRATION_ID_SCHEME]()
+
+class WorkerIdLease:
+    """A Snowflake worker id held in id_workers as {_id, owner, lease_until}.
+
+    A free or expired id is taken with a guarded upsert: when the filter
+    misses because another owner's lease is live, the upsert collides on
+    _id. Searching from a random id keeps starting workers apart. If a
+    renewal finds the lease gone (say the process stalled past it), a new
+    id is leased; ids minted in the overlap are still caught by the unique
+    index.
+    """
+
+    def __init__(self, generator: SnowflakeIdGenerator):
+        self.generator = generator
+        self.owner: Optional[str] = None
+        self.worker_id: Optional[int] = None
+
+    async def acquire(self) -> Optional[int]:
+        """Lease a free worker id and hand it to the generator; None if all are held."""
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        now = datetime.now(timezone.utc)
+        until = now + timedelta(seconds=REGISTRATION_ID_LEASE_SECONDS)
+        start = random.randrange(REGISTRATION_ID_WORKERS)
+        for offset in range(REGISTRATION_ID_WORKERS):
+            worker_id = (start + offset) % REGISTRATION_ID_WORKERS
+            try:
+                await db.id_workers.update_one(
+                    {"_id": worker_id, "$or": [{"owner": self.owner}, {"lease_until": {"$lt": now}}]},
+                    {"$set": {"owner": self.owner, "lease_until": until}},
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                continue
+            self.worker_id = worker_id
+            self.generator.use_worker(worker_id)
+            return worker_id
+        logger.warning("All %d registration id workers are leased; using a hashed worker id", REGISTRATION_ID_WORKERS)
+        self.worker_id = None
+        self.generator.use_worker(None)
+        return None
+
+    async def renew(self):
+        if self.worker_id is not None:
+            result = await db.id_workers.update_one(
+                {"_id": self.worker_id, "owner": self.owner},
+                {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=REGISTRATION_ID_LEASE_SECONDS)}},
+            )
+            if result.matched_count:
+                return
+            logger.warning("Lost the lease on registration id worker %d; leasing another", self.worker_id)
+        await self.acquire()
+
+    async def release(self):
+        if self.worker_id is not None:
+            await db.id_workers.delete_one({"_id": self.worker_id, "owner": self.owner})
+            self.worker_id = None
+
+worker_lease = WorkerIdLease(new_registration_id) if isinstance(new_registration_id, SnowflakeIdGenerator) else None
+
+# -------------------------------------------------------------------
+# PAGINATION
+# -------------------------------------------------------------------
+
+# Keyset order for registration listings. `id` breaks ties between rows
+# created in the same millisecond so the cursor never skips or repeats.
+REGISTRATION_SORT = [("created_at", -1), ("id", -1)]
+PAGE_SIZE_DEFAULT = 1000
+PAGE_SIZE_MAX = 1000
+STREAM_BATCH_SIZE = 500
+TEAM_PAGE_SIZE_DEFAULT = 100
+TEAM_PAGE_SIZE_MAX = 1000
+TEAM_MEMBER_FIELDS = ("registration_id", "full_name", "email", "college", "payment_status", "checked_in_at")
+
+# How full registration rows are serialized for list responses:
+# "model" validates each row through response_model (the FastAPI default),
+# "validated" validates the page once with a TypeAdapter, "trusted" skips
+# validation and encodes the Mongo rows directly with orjson.
+REGISTRATION_SERIALIZER = os.getenv("REGISTRATION_SERIALIZER", "model")
+
+# -------------------------------------------------------------------
+# EXPORT CONFIG
+# -------------------------------------------------------------------
+
+EXPORT_COLUMNS = [
+    "registration_id",
+    "full_name",
+    "email",
+    "phone",
+    "college",
+    "team_name",
+    "payment_status",
+    "transaction_id",
+    "order_id",
+    "amount",
+    "created_at",
+    "checked_in_at",
+]
+EXPORT_CHUNK_SIZE = 64 * 1024  # flush the CSV buffer once it holds this many chars
+
+# Bulk uploads are parsed as they stream in and written BULK_BATCH_SIZE
+# rows per round trip.
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "100000"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(50 * 1024 * 1024)))
+BULK_MAX_REPORTED_ERRORS = 1000
+
+# -------------------------------------------------------------------
+# STATS CONFIG
+# -------------------------------------------------------------------
+
+PAID_STATUS = "completed"
+PENDING_STATUS = "pending"
+FAILED_STATUS = "failed"
+STATS_TTL_SECONDS = int(os.getenv("STATS_TTL_SECONDS", "60"))
+# Team counts are kept by $inc on sign-up and recounted after payment
+# changes; a full recount this often repairs any drift. 0 disables it.
+TEAMS_REFRESH_SECONDS = int(os.getenv("TEAMS_REFRESH_SECONDS", "900"))
+
+# -------------------------------------------------------------------
+# LIFECYCLE CONFIG
+# -------------------------------------------------------------------
+
+# Pending registrations that never created an order are moved to
+# registrations_archive once older than this; 0 disables archiving. Each
+# leaves a stub (email, registration_id, archived: true) in registrations
+# that keeps both reserved; signing up, importing or ordering again brings
+# the registration back, even with archiving disabled.
+ARCHIVE_PENDING_AFTER_HOURS = int(os.getenv("ARCHIVE_PENDING_AFTER_HOURS", "0"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_MAX_PER_RUN = int(os.getenv("ARCHIVE_MAX_PER_RUN", "50000"))
+
+# -------------------------------------------------------------------
+# LIVE EVENTS CONFIG
+# -------------------------------------------------------------------
+
+# "local" publishes from this worker's write paths, so a dashboard only sees
+# writes made by the worker serving its stream; "changestream" tails a Mongo
+# change stream (replica set or mongos required) so every worker sees every
+# write. "auto" picks changestream whenever the deployment supports it.
+ADMIN_EVENTS_SOURCE = os.getenv("ADMIN_EVENTS_SOURCE", "auto")
+EVENT_SUBSCRIBER_QUEUE_MAX = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_MAX", "100"))
+EVENT_KEEPALIVE_SECONDS = 15
+# EventSource cannot send headers, and a bearer token in the URL would land
+# in access logs, so the stream is opened with a single-use ticket instead.
+EVENT_TICKET_TTL_SECONDS = int(os.getenv("EVENT_TICKET_TTL_SECONDS", "30"))
+EVENT_FIELDS = (
+    "registration_id", "full_name", "email", "college", "team_name",
+    "payment_status", "order_id", "created_at",
+)
+
+# -------------------------------------------------------------------
+# JOBS CONFIG
+# -------------------------------------------------------------------
+
+# Side effects (mail) are written to a `jobs` outbox next to the data and
+# drained by a worker pool in every process; 0 workers disables draining.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RATE_PER_SECOND = float(os.getenv("JOB_RATE_PER_SECOND", "10"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "6"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "30"))
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "60"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# Without SMTP_HOST mail is logged instead of sent.
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_FROM = os.getenv("SMTP_FROM", "Neuron Club <no-reply@neuron.club>")
+SMTP_MAX_WORKERS = int(os.getenv("SMTP_MAX_WORKERS", "2"))
+
 # -------------------------------------------------------------------
 # RAZORPAY
 # -------------------------------------------------------------------
 
-razorpay_client = razorpay.Client(
-    auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "razorpay")  # "razorpay" or "fake"
+GATEWAY_MAX_WORKERS = int(os.getenv("GATEWAY_MAX_WORKERS", "8"))
+GATEWAY_TIMEOUT_SECONDS = float(os.getenv("GATEWAY_TIMEOUT_SECONDS", "10"))
+GATEWAY_MAX_RETRIES = int(os.getenv("GATEWAY_MAX_RETRIES", "2"))
+GATEWAY_RETRY_BACKOFF_SECONDS = float(os.getenv("GATEWAY_RETRY_BACKOFF_SECONDS", "0.2"))
+GATEWAY_BREAKER_THRESHOLD = int(os.getenv("GATEWAY_BREAKER_THRESHOLD", "5"))
+GATEWAY_BREAKER_RESET_SECONDS = float(os.getenv("GATEWAY_BREAKER_RESET_SECONDS", "30"))
+FAKE_GATEWAY_LATENCY_MS = int(os.getenv("FAKE_GATEWAY_LATENCY_MS", "0"))
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")
+
+# The reconciler re-checks pending registrations that hold an order against
+# the gateway, for payments whose browser callback and webhook both got lost.
+# One worker at a time holds the sweep, via a lease on its checkpoint.
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("RECONCILE_INTERVAL_SECONDS", "300"))  # 0 disables
+RECONCILE_MIN_AGE_SECONDS = int(os.getenv("RECONCILE_MIN_AGE_SECONDS", "900"))
+RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", "100"))
+RECONCILE_MAX_PER_RUN = int(os.getenv("RECONCILE_MAX_PER_RUN", "2000"))
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "4"))
+RECONCILE_RATE_PER_SECOND = float(os.getenv("RECONCILE_RATE_PER_SECOND", "5"))
+
+# create-order responses are replayed for a repeated Idempotency-Key.
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+
+# Payment status transitions are applied in bulk_write batches.
+PAYMENT_BATCH_SIZE = int(os.getenv("PAYMENT_BATCH_SIZE", "100"))
+PAYMENT_BATCH_WAIT_MS = int(os.getenv("PAYMENT_BATCH_WAIT_MS", "50"))
+PAYMENT_QUEUE_MAX = int(os.getenv("PAYMENT_QUEUE_MAX", "10000"))
+
+class RazorpayGateway:
+    """Blocking Razorpay SDK calls; always run through call_gateway().
+
+    The SDK (and requests under it) is imported here rather than at module
+    level so it stays off the import path until the gateway is connected.
+    """
+
+    def __init__(self, key_id: str, key_secret: str):
+        import razorpay
+        import requests
+        from razorpay.errors import BadRequestError, ServerError
+
+        self.client = razorpay.Client(auth=(key_id, key_secret))
+        # Worth retrying: the gateway never answered or answered with a 5xx.
+        self.transient_errors = (requests.ConnectionError, requests.Timeout, ServerError)
+        # The gateway answered and refused; retrying would not help.
+        self.rejected_errors = (BadRequestError,)
+
+    def create_order(self, payload: dict) -> dict:
+        return self.client.order.create(payload)
+
+    def fetch_order_payments(self, order_id: str) -> List[dict]:
+        return self.client.order.payments(order_id).get("items", [])
+
+class FakeGateway:
+    """In-memory gateway for offline load tests (PAYMENT_GATEWAY=fake).
+
+    Sleeps for FAKE_GATEWAY_LATENCY_MS to stand in for the HTTP round trip,
+    so it ties up a pool thread exactly like the real client would.
+    """
+
+    transient_errors = ()
+    rejected_errors = ()
+
+    def __init__(self, latency_ms: int = 0):
+        self.latency = latency_ms / 1000
+        self.orders = {}
+        self.payments: Dict[str, List[dict]] = {}
+        self._lock = threading.Lock()
+
+    def create_order(self, payload: dict) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+
+        order = {
+            "id": f"order_{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": payload["amount"],
+            "currency": payload.get("currency", "INR"),
+            "status": "created",
+        }
+        with self._lock:
+            self.orders[order["id"]] = order
+        return order
+
+    def fetch_order_payments(self, order_id: str) -> List[dict]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            return list(self.payments.get(order_id, []))
+
+    def record_payment(self, order_id: str, status: str = "captured") -> dict:
+        """Simulate a payment attempt the app never heard about."""
+        payment = {
+            "id": f"pay_{uuid.uuid4().hex[:14]}",
+            "entity": "payment",
+            "order_id": order_id,
+            "amount": self.orders.get(order_id, {}).get("amount"),
+            "status": status,
+            "created_at": int(time.time()),
+        }
+        with self._lock:
+            self.payments.setdefault(order_id, []).append(payment)
+        return payment
+
+class CircuitBreaker:
+    """Fail fast after `threshold` consecutive gateway failures.
+
+    While open, one probe call is let through every `reset_after` seconds;
+    a successful probe closes the breaker again.
+    """
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+# Created by connect_gateway() in the lifespan handler.
+payment_gateway = None
+
+def connect_gateway():
+    global payment_gateway
+    if payment_gateway is not None:
+        return
+    if PAYMENT_GATEWAY == "fake":
+        payment_gateway = FakeGateway(latency_ms=FAKE_GATEWAY_LATENCY_MS)
+    else:
+        payment_gateway = RazorpayGateway(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+
+gateway_executor = ThreadPoolExecutor(
+    max_workers=GATEWAY_MAX_WORKERS,
+    thread_name_prefix="gateway",
 )
+gateway_breaker = CircuitBreaker(GATEWAY_BREAKER_THRESHOLD, GATEWAY_BREAKER_RESET_SECONDS)
 
 # -------------------------------------------------------------------
 # APP SETUP
 # -------------------------------------------------------------------
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+app = FastAPI(lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
+logger = logging.getLogger(__name__)
+
+background_tasks: List[asyncio.Task] = []
 
 # -------------------------------------------------------------------
 # MODELS
@@ -107,6 +929,37 @@ class Registration(BaseModel):
     order_id: Optional[str] = None
     amount: Optional[int] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    checked_in_at: Optional[datetime] = None
+    team_key: Optional[str] = None
+
+    @model_validator(mode="after")
+    def fill_team_key(self):
+        if self.team_key is None and self.team_name:
+            self.team_key = normalize_team_name(self.team_name)
+        return self
+
+class RegistrationUpdate(BaseModel):
+    """One row of a bulk update: an offline payment, a check-in, or both."""
+    registration_id: str
+    payment_status: Optional[str] = Field(None, pattern="^(pending|completed|failed)$")
+    transaction_id: Optional[str] = None
+    amount: Optional[int] = None
+    checked_in: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def has_change(self):
+        if self.payment_status is None and self.checked_in is None:
+            raise ValueError("payment_status or checked_in is required")
+        return self
+
+class Team(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    team_key: str
+    team_name: str
+    member_count: int = 0
+    paid_count: int = 0
+    unpaid_count: int = 0
+    updated_at: Optional[datetime] = None
 
 class PaymentOrderCreate(BaseModel):
     amount: int
@@ -121,142 +974,2411 @@ class PaymentVerify(BaseModel):
     razorpay_signature: str
     registration_id: str
 
+class PaymentTransition(BaseModel):
+    order_id: str
+    payment_id: str
+    status: str
+    registration_id: Optional[str] = None
+    amount: Optional[int] = None
+
 # -------------------------------------------------------------------
 # AUTH HELPERS
 # -------------------------------------------------------------------
 
+class TokenCache:
+    """LRU of verified tokens keyed by the token's SHA-256.
+
+    An entry never outlives the token's own `exp`. Revoked keys are kept
+    until they expire so a revoked token cannot be re-cached on this worker.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.revoked: Dict[str, float] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        subject, expires = entry
+        if expires <= time.time():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return subject
+
+    def put(self, key: str, subject: str, exp: float):
+        self.entries[key] = (subject, min(exp, time.time() + self.ttl))
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def revoke(self, key: str, exp: float):
+        now = time.time()
+        self.entries.pop(key, None)
+        self.revoked = {k: e for k, e in self.revoked.items() if e > now}
+        self.revoked[key] = exp
+
+    def is_revoked(self, key: str) -> bool:
+        exp = self.revoked.get(key)
+        return exp is not None and exp > time.time()
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+
 def create_access_token(data: dict):
     payload = data.copy()
     payload["exp"] = datetime.now(timezone.utc) + timedelta(
         minutes=ACCESS_TOKEN_EXPIRE_MINUTES
     )
+    # A unique jti keeps a token rotated within the same second distinct
+    # from the one it replaces.
+    payload["jti"] = uuid.uuid4().hex
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_token(authorization: str = Header(None)):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
-    token = authorization.split(" ")[1]
+def decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-# -------------------------------------------------------------------
-# ADMIN ROUTES
-# -------------------------------------------------------------------
+def bearer_token(authorization: Optional[str]) -> str:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authorization header")
+    return authorization.split(" ")[1]
 
-@api_router.post("/auth/admin-login")
-async def admin_login(credentials: AdminLogin):
-    admin = await db.admins.find_one({"username": credentials.username})
-    if not admin:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+async def authenticate(token: str) -> str:
+    """Return the token's subject, verifying the signature only on a cache miss."""
+    key = token_key(token)
+    subject = token_cache.get(key)
+    if subject is not None:
+        return subject
 
-    if not bcrypt.checkpw(
-        credentials.password.encode(),
-        admin["hashed_password"].encode()
-    ):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+    payload = decode_token(token)
+    if token_cache.is_revoked(key) or await db.revoked_tokens.find_one({"_id": key}, {"_id": 1}):
+        raise HTTPException(status_code=401, detail="Token revoked")
 
-    token = create_access_token({"sub": credentials.username})
-    return {"access_token": token, "token_type": "bearer"}
+    subject = payload.get("sub")
+    token_cache.put(key, subject, payload.get("exp") or time.time())
+    return subject
 
-# -------------------------------------------------------------------
-# REGISTRATION ROUTES
-# -------------------------------------------------------------------
+async def revoke_token(token: str):
+    payload = decode_token(token)
+    key = token_key(token)
+    exp = payload.get("exp") or time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
-@api_router.post("/registrations", response_model=Registration)
-async def create_registration(reg: RegistrationCreate):
-    if reg.honeypot:
-        raise HTTPException(status_code=400, detail="Invalid submission")
+    token_cache.revoke(key, exp)
+    await db.revoked_tokens.update_one(
+        {"_id": key},
+        {"$set": {"expires_at": datetime.fromtimestamp(exp, timezone.utc)}},
+        upsert=True
+    )
 
-    if await db.registrations.find_one({"email": reg.email}):
-        raise HTTPException(status_code=400, detail="Email already registered")
+async def verify_token(authorization: str = Header(None)):
+    return await authenticate(bearer_token(authorization))
 
-    registration_id = f"NEU{datetime.now().strftime('%Y%m%d')}{uuid.uuid4().hex[:8].upper()}"
+class LoginAttemptLimiter:
+    """Sliding-window count of failed logins per key.
 
-    registration = Registration(
-        registration_id=registration_id,
-        full_name=reg.full_name,
-        email=reg.email,
-        phone=reg.phone,
-        college=reg.college,
-        team_name=reg.team_name
-    )
+    Only failures are recorded and a successful login clears them.
+    retry_after is the hard lockout; delay is the progressive back-off
+    for keys an attacker shares with the real user, such as the username.
+    """
 
-    await db.registrations.insert_one(registration.model_dump())
-    return registration
+    def __init__(self, max_attempts: int, window: float, max_delay: int):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_delay = max_delay
+        # Enough failures to reach max_delay; older ones change nothing.
+        self.history = max_attempts + max(max_delay, 1).bit_length()
+        self.attempts: Dict[str, Deque[float]] = {}
 
-@api_router.get("/registrations", response_model=List[Registration])
-async def get_registrations(_: str = Depends(verify_token)):
-    return await db.registrations.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        attempts = self.attempts.get(key)
+        if attempts is None:
+            return deque()
+        while attempts and now - attempts[0] > self.window:
+            attempts.popleft()
+        if not attempts:
+            del self.attempts[key]
+        return attempts
+
+    def retry_after(self, *keys: str) -> Optional[int]:
+        """Seconds until the first blocked key frees up, or None."""
+        now = time.monotonic()
+        for key in keys:
+            attempts = self._recent(key, now)
+            if len(attempts) >= self.max_attempts:
+                return int(attempts[-self.max_attempts] + self.window - now) + 1
+        return None
+
+    def delay(self, key: str) -> float:
+        """Seconds to hold a login for key: doubling per failure past max_attempts."""
+        over = len(self._recent(key, time.monotonic())) - self.max_attempts
+        if over < 0:
+            return 0.0
+        return float(min(self.max_delay, 2 ** over))
+
+    def record(self, *keys: str):
+        now = time.monotonic()
+        if len(self.attempts) > LOGIN_TRACKED_KEYS_MAX:
+            for key in list(self.attempts):
+                self._recent(key, now)
+        for key in keys:
+            self.attempts.setdefault(key, deque(maxlen=self.history)).append(now)
+
+    def reset(self, *keys: str):
+        for key in keys:
+            self.attempts.pop(key, None)
+
+login_limiter = LoginAttemptLimiter(LOGIN_MAX_ATTEMPTS, LOGIN_WINDOW_SECONDS, LOGIN_DELAY_MAX_SECONDS)
+hash_executor = ThreadPoolExecutor(max_workers=HASH_MAX_WORKERS, thread_name_prefix="bcrypt")
+hash_slots = asyncio.Semaphore(HASH_MAX_PENDING)
+
+async def run_hash(fn, *args):
+    """Run a bcrypt call on the hashing pool, shedding load when it backs up."""
+    if hash_slots.locked():
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+
+    async with hash_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, functools.partial(fn, *args))
 
 # -------------------------------------------------------------------
-# PAYMENTS
+# RATE LIMITING
 # -------------------------------------------------------------------
 
-@api_router.post("/payment/create-order")
-async def create_payment_order(data: PaymentOrderCreate):
-    registration = await db.registrations.find_one(
-        {"registration_id": data.registration_id}
-    )
+def client_ip(request: Request) -> Optional[str]:
+    """The caller's address for per-IP keys, or None while RATE_LIMIT_BY_IP is off.
 
-    if not registration:
-        raise HTTPException(status_code=404, detail="Registration not found")
+    Behind a proxy request.client is only the real caller when the server
+    trusts the proxy's X-Forwarded-For (FORWARDED_ALLOW_IPS in gunicorn.conf.py).
+    """
+    if not RATE_LIMIT_BY_IP:
+        return None
+    return request.client.host if request.client else ""
 
-    order = razorpay_client.order.create({
-        "amount": data.amount,
-        "currency": "INR",
-        "payment_capture": 1
-    })
+class MemoryBucketStore:
+    """Token buckets held in this worker, evicted least recently used."""
 
-    await db.registrations.update_one(
-        {"registration_id": data.registration_id},
-        {"$set": {"order_id": order["id"], "amount": data.amount}}
-    )
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
 
-    return {
-        "order_id": order["id"],
-        "amount": order["amount"],
-        "key_id": RAZORPAY_KEY_ID
-    }
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Spend one token; returns 0 if allowed, else seconds until one refills."""
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return wait
+
+class MongoBucketStore:
+    """Token buckets shared by every worker, one document per key.
+
+    Refill and spend happen in a single pipeline update, so concurrent
+    workers never double-spend a token. Idle buckets expire via TTL index.
+    """
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.time()
+        tokens = {"$min": [burst, {"$add": [
+            {"$ifNull": ["$tokens", burst]},
+            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, rate]},
+        ]}]}
+        pipeline = [
+            {"$set": {
+                "tokens": tokens,
+                "updated_at": now,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=burst / rate),
+            }},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+        ]
+        for attempt in range(2):
+            try:
+                bucket = await db.rate_limits.find_one_and_update(
+                    {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER,
+                )
+                break
+            except DuplicateKeyError:
+                # Two workers upserted a new bucket at once; the retry updates it.
+                if attempt:
+                    raise
+        return 0.0 if bucket["allowed"] else (1 - bucket["tokens"]) / rate
+
+RATE_LIMIT_STORES = {
+    "memory": lambda: MemoryBucketStore(RATE_LIMIT_TRACKED_KEYS_MAX),
+    "mongo": MongoBucketStore,
+}
+rate_limit_store = RATE_LIMIT_STORES[RATE_LIMIT_BACKEND]()
+
+class RateLimit:
+    """A named token-bucket rule; each checked value gets its own bucket."""
+
+    def __init__(self, name: str, per_minute: float, burst: int):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+
+    async def check(self, value: Optional[str]):
+        if value is None:
+            return  # key not available, e.g. client_ip() with RATE_LIMIT_BY_IP off
+        try:
+            wait = await rate_limit_store.take(f"{self.name}:{value}", self.rate, self.burst)
+        except Exception:
+            # A shared store outage should not take sign-ups down with it.
+            logger.exception("Rate limit store unavailable, allowing %s", self.name)
+            return
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(int(wait) + 1)},
+            )
+
+ip_limit = RateLimit("ip", RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST)
+email_limit = RateLimit("email", RATE_LIMIT_KEY_PER_MINUTE, RATE_LIMIT_KEY_BURST)
+order_limit = RateLimit("order", RATE_LIMIT_KEY_PER_MINUTE, RATE_LIMIT_KEY_BURST)
+
+async def shed_load():
+    """Dependency answering 503 before any work is done while the worker is overloaded.
+
+    In-flight requests stand in for queue depth; loop lag catches the case
+    where the loop itself is the bottleneck.
+    """
+    overloaded = (
+        (SHED_MAX_IN_FLIGHT and HTTP_IN_FLIGHT.get() > SHED_MAX_IN_FLIGHT)
+        or (SHED_MAX_LOOP_LAG_SECONDS and LOOP_LAG.get() > SHED_MAX_LOOP_LAG_SECONDS)
+    )
+    if overloaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(SHED_RETRY_AFTER_SECONDS)},
+        )
 
 # -------------------------------------------------------------------
-# APP CONFIG
+# GATEWAY HELPERS
 # -------------------------------------------------------------------
 
-CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "")
+async def gateway_attempt(loop, method: str, call):
+    """One timed, time-limited gateway call; GATEWAY_LATENCY records its outcome."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await asyncio.wait_for(
+            loop.run_in_executor(gateway_executor, call),
+            GATEWAY_TIMEOUT_SECONDS,
+        )
+        outcome = "ok"
+        return result
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise
+    except payment_gateway.rejected_errors:
+        outcome = "rejected"
+        raise
+    finally:
+        GATEWAY_LATENCY.observe(time.perf_counter() - start, method, outcome)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[origin.strip() for origin in CORS_ORIGINS.split(",") if origin.strip()],
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-)
+async def call_gateway(method: str, *args):
+    """Run a blocking gateway call on the bounded pool.
 
-app.include_router(api_router)
+    Each attempt is capped at GATEWAY_TIMEOUT_SECONDS; transient failures
+    are retried with full-jitter backoff and feed the circuit breaker.
+    A timed-out attempt keeps its pool thread until the SDK gives up, which
+    is why the pool is bounded.
+    """
+    if not gateway_breaker.allow():
+        raise HTTPException(status_code=503, detail="Payment gateway unavailable, please retry shortly")
+
+    loop = asyncio.get_running_loop()
+    call = functools.partial(getattr(payment_gateway, method), *args)
+
+    for attempt in range(GATEWAY_MAX_RETRIES + 1):
+        try:
+            result = await gateway_attempt(loop, method, call)
+        except (asyncio.TimeoutError, *payment_gateway.transient_errors) as exc:
+            gateway_breaker.record_failure()
+            if attempt == GATEWAY_MAX_RETRIES or gateway_breaker.is_open:
+                logger.warning("Gateway %s failed after %d attempts: %r", method, attempt + 1, exc)
+                raise HTTPException(status_code=502, detail="Payment gateway error")
+            await asyncio.sleep(random.uniform(0, GATEWAY_RETRY_BACKOFF_SECONDS * 2 ** attempt))
+        except payment_gateway.rejected_errors as exc:
+            gateway_breaker.record_success()
+            raise HTTPException(status_code=400, detail=str(exc))
+        else:
+            gateway_breaker.record_success()
+            return result
+
+class IdempotencyCache:
+    """Results of keyed calls, replayed for `ttl` seconds.
+
+    A call arriving while the first one with the same key is still running
+    waits for that result instead of starting its own. Failures are not
+    cached, so the client can retry with the same key. With replay=False
+    only calls still in flight are shared; the entry goes once it finishes.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[float, str, asyncio.Future]]" = OrderedDict()
+
+    async def run(self, key: str, fingerprint: str, call, replay: bool = True):
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > now:
+            _, seen_fingerprint, future = entry
+            if seen_fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key reused with a different request")
+            self.entries.move_to_end(key)
+            # Shielded so a disconnecting duplicate can't cancel the original.
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = self.entries[key] = (now + self.ttl, fingerprint, future)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+        try:
+            result = await call()
+        except BaseException as exc:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(exc)
+                future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        future.set_result(result)
+        if not replay and self.entries.get(key) is entry:
+            del self.entries[key]
+        return result
+
+order_requests = IdempotencyCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL_SECONDS)
 
 # -------------------------------------------------------------------
-# STARTUP
+# PAGINATION HELPERS
 # -------------------------------------------------------------------
 
-@app.on_event("startup")
-async def startup():
-    if not await db.admins.find_one({"username": "admin"}):
-        hashed = bcrypt.hashpw(
-            ADMIN_PASSWORD.encode(),
-            bcrypt.gensalt()
-        ).decode()
+def encode_cursor(doc: dict) -> str:
+    raw = f"{doc['created_at'].isoformat()}|{doc['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str, ascending: bool = False) -> dict:
+    """Turn an opaque cursor into a query matching rows after it."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, last_id = raw.split("|", 1)
+        created_at = datetime.fromisoformat(created_at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    op = "$gt" if ascending else "$lt"
+    return {
+        "$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "id": {op: last_id}},
+        ]
+    }
+
+def registration_filters(
+    payment_status: Optional[str] = Query(None, pattern="^(pending|completed|failed)$"),
+    college: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = Query(None, min_length=2, max_length=100),
+) -> dict:
+    """Admin list/export filters as a Mongo query, each backed by an index."""
+    query = {"archived": {"$ne": True}}
+    if payment_status:
+        query["payment_status"] = payment_status
+    if college:
+        query["college"] = college
+    if date_from or date_to:
+        query["created_at"] = {}
+        if date_from:
+            query["created_at"]["$gte"] = date_from
+        if date_to:
+            query["created_at"]["$lt"] = date_to
+    if q:
+        query["$text"] = {"$search": q}
+    return query
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Validate a comma-separated projection; id and created_at always ride along for the cursor."""
+    if not fields:
+        return None
+
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in Registration.model_fields]
+    if not selected or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown) or fields}"
+        )
+    return list(dict.fromkeys(["id", "created_at", *selected]))
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+registration_list_adapter = TypeAdapter(List[Registration])
+
+def registration_list_body(page: List[dict], projected: bool, serializer: str = REGISTRATION_SERIALIZER) -> bytes:
+    """Encode a page for the fast paths; projected rows are always trusted."""
+    if serializer == "validated" and not projected:
+        rows = registration_list_adapter.validate_python(page)
+        return registration_list_adapter.dump_json(rows)
+    return orjson.dumps(page)
+
+async def stream_ndjson(rows, validate: bool = True):
+    try:
+        async for doc in rows:
+            if validate:
+                yield Registration.model_validate(doc).model_dump_json() + "\n"
+            else:
+                yield orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE)
+    finally:
+        await rows.close()
+
+# -------------------------------------------------------------------
+# EXPORT HELPERS
+# -------------------------------------------------------------------
+
+def parse_export_columns(columns: Optional[str]) -> List[str]:
+    if not columns:
+        return EXPORT_COLUMNS
+
+    selected = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+    if not selected or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown export columns: {', '.join(unknown) or columns}"
+        )
+    return selected
+
+# Spreadsheets run a cell starting with one of these as a formula.
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+async def stream_csv(rows, columns: List[str], compress: bool = False):
+    """Yield CSV chunks of roughly EXPORT_CHUNK_SIZE from a Motor cursor.
+
+    Only the current chunk is ever held in memory. With `compress` the
+    chunks are gzip members of a single stream, compressed as they go.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    gz = zlib.compressobj(wbits=31) if compress else None
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return gz.compress(data) if gz else data
+
+    try:
+        writer.writerow(columns)
+        async for doc in rows:
+            writer.writerow([csv_value(doc.get(c)) for c in columns])
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                chunk = drain()
+                if chunk:
+                    yield chunk
+
+        chunk = drain()
+        if gz:
+            chunk += gz.flush()
+        if chunk:
+            yield chunk
+    finally:
+        await rows.close()
+
+# -------------------------------------------------------------------
+# BULK UPLOAD HELPERS
+# -------------------------------------------------------------------
+
+async def stream_lines(request: Request):
+    """Yield decoded lines of the request body as it arrives, line endings kept."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > BULK_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Upload too large")
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+async def csv_records(lines):
+    """Group lines into CSV records; an odd quote count means a quoted field continues."""
+    record, quotes = "", 0
+    async for line in lines:
+        record += line
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        yield next(csv.reader(io.StringIO(record)), [])
+        record, quotes = "", 0
+    if record:
+        yield next(csv.reader(io.StringIO(record)), [])
+
+async def upload_rows(request: Request):
+    """Yield (row, error) for each data row of a CSV or NDJSON upload.
+
+    CSV needs a header line; empty cells are treated as missing.
+    """
+    content_type = request.headers.get("content-type", "")
+    lines = stream_lines(request)
+
+    if "csv" in content_type:
+        header = None
+        async for fields in csv_records(lines):
+            if not any(field.strip() for field in fields):
+                continue
+            if header is None:
+                header = [field.strip() for field in fields]
+                continue
+            yield {k: v.strip() for k, v in zip(header, fields) if v.strip()}, None
+    elif "json" in content_type:
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield None, "Invalid JSON"
+                continue
+            yield (row, None) if isinstance(row, dict) else (None, "Expected a JSON object")
+    else:
+        raise HTTPException(status_code=415, detail="Upload text/csv or application/x-ndjson")
+
+def validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+class BulkReport:
+    """Per-upload outcome; only the first BULK_MAX_REPORTED_ERRORS errors are listed."""
+
+    def __init__(self):
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def fail(self, row: int, error: str):
+        self.failed += 1
+        if len(self.errors) < BULK_MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+async def apply_upload(request: Request, model, write) -> dict:
+    """Validate each uploaded row as `model` and hand valid ones to write() in batches.
+
+    write(batch, report) receives (row, item) pairs. Reading pauses while a
+    batch is written, so a large upload never sits in memory.
+    """
+    report = BulkReport()
+    batch = []
+    try:
+        async for data, error in upload_rows(request):
+            if report.processed == BULK_MAX_ROWS:
+                report.fail(report.processed + 1, f"Row limit of {BULK_MAX_ROWS} reached; the rest was not processed")
+                break
+            report.processed += 1
+            row = report.processed
+            if error is None:
+                try:
+                    batch.append((row, model.model_validate(data)))
+                except ValidationError as exc:
+                    error = validation_message(exc)
+            if error is not None:
+                report.fail(row, error)
+            if len(batch) >= BULK_BATCH_SIZE:
+                await write(batch, report)
+                batch = []
+    except UnicodeDecodeError:
+        report.fail(report.processed + 1, "Upload is not valid UTF-8; the rest was not processed")
+
+    if batch:
+        await write(batch, report)
+    return report.as_dict()
+
+# -------------------------------------------------------------------
+# STATS
+# -------------------------------------------------------------------
+
+class RegistrationStats:
+    """Dashboard counters kept up to date by the write paths.
+
+    Handlers bump the counters as they write, so serving stats is a dict
+    lookup. A periodic aggregation overwrites them with the database's view,
+    which bounds drift from other workers or out-of-band writes to
+    STATS_TTL_SECONDS.
+    """
+
+    def __init__(self):
+        self.by_status = Counter()
+        self.by_college = Counter()
+        self.by_day = Counter()
+        self.revenue = 0  # paise
+        self.reconciled_at: Optional[float] = None
+        self._snapshot: Optional[dict] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def stale(self) -> bool:
+        return (
+            self.reconciled_at is None
+            or time.monotonic() - self.reconciled_at > STATS_TTL_SECONDS
+        )
+
+    def record_registration(self, registration: "Registration"):
+        self.by_status[registration.payment_status] += 1
+        self.by_college[registration.college] += 1
+        self.by_day[registration.created_at.strftime("%Y-%m-%d")] += 1
+        self._snapshot = None
+
+    def record_transition(self, status: str, amount: Optional[int] = None,
+                          previous: str = PENDING_STATUS):
+        self.by_status[previous] -= 1
+        self.by_status[status] += 1
+        if status == PAID_STATUS:
+            self.revenue += amount or 0
+        self._snapshot = None
+
+    def invalidate(self):
+        self.reconciled_at = None
+
+    async def reconcile(self, force: bool = False):
+        async with self._lock:
+            if not force and not self.stale:
+                return
+
+            result = await admin_db.registrations.aggregate([
+                {"$match": {"archived": {"$ne": True}}},
+                {"$facet": {
+                    "status": [{"$group": {
+                        "_id": "$payment_status",
+                        "count": {"$sum": 1},
+                        "revenue": {"$sum": {"$ifNull": ["$amount", 0]}},
+                    }}],
+                    "college": [{"$group": {"_id": "$college", "count": {"$sum": 1}}}],
+                    "day": [{"$group": {
+                        "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                        "count": {"$sum": 1},
+                    }}],
+                }}
+            ]).to_list(1)
+            facets = result[0]
+
+            # Writes that land while the pipeline runs may be counted twice or
+            # not at all; the next reconcile corrects them.
+            self.by_status = Counter({r["_id"]: r["count"] for r in facets["status"]})
+            self.by_college = Counter({r["_id"]: r["count"] for r in facets["college"]})
+            self.by_day = Counter({r["_id"]: r["count"] for r in facets["day"]})
+            self.revenue = sum(r["revenue"] for r in facets["status"] if r["_id"] == PAID_STATUS)
+            self.reconciled_at = time.monotonic()
+            self._snapshot = None
+
+    def snapshot(self) -> dict:
+        if self._snapshot is None:
+            self._snapshot = {
+                "total_registrations": sum(self.by_status.values()),
+                "paid_registrations": self.by_status[PAID_STATUS],
+                "pending_registrations": self.by_status[PENDING_STATUS],
+                "total_revenue_inr": self.revenue / 100,
+                "by_college": dict(self.by_college.most_common()),
+                "by_day": dict(sorted(self.by_day.items())),
+            }
+        return self._snapshot
+
+registration_stats = RegistrationStats()
+
+# -------------------------------------------------------------------
+# TEAMS
+# -------------------------------------------------------------------
+
+def normalize_team_name(name: str) -> Optional[str]:
+    """Case- and whitespace-insensitive key, so "Team  Rocket" and "team rocket" are one team."""
+    return " ".join(name.split()).casefold() or None
+
+async def record_team_members(registrations: List["Registration"]):
+    """Count freshly inserted (so unpaid) registrations into their teams with $inc upserts."""
+    joined: Dict[str, List["Registration"]] = {}
+    for registration in registrations:
+        if registration.team_key:
+            joined.setdefault(registration.team_key, []).append(registration)
+    if not joined:
+        return
+
+    now = datetime.now(timezone.utc)
+    try:
+        await db.teams.bulk_write([
+            UpdateOne(
+                {"team_key": key},
+                {
+                    "$inc": {"member_count": len(members), "unpaid_count": len(members)},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"team_name": members[0].team_name.strip(), "paid_count": 0},
+                },
+                upsert=True,
+            )
+            for key, members in joined.items()
+        ], ordered=False)
+    except Exception:
+        # The view is derived; a rebuild recovers it, so sign-ups never fail on it.
+        logger.exception("Failed to count %d registrations into teams", len(registrations))
+
+async def refresh_teams(keys: Optional[List[str]] = None):
+    """Recount teams from their registrations; None recounts every team and drops empty ones.
+
+    A team touched after the recount started is never dropped: a sign-up
+    may have counted into it since the aggregate read.
+    """
+    match = {"team_key": {"$in": keys}} if keys is not None else {"team_key": {"$ne": None}}
+    if keys is not None and not keys:
+        return
+    started = datetime.now(timezone.utc)
+
+    counts = await db.registrations.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$team_key",
+            "team_name": {"$first": "$team_name"},
+            "member_count": {"$sum": 1},
+            "paid_count": {"$sum": {"$cond": [{"$eq": ["$payment_status", PAID_STATUS]}, 1, 0]}},
+        }},
+    ]).to_list(None)
+
+    now = datetime.now(timezone.utc)
+    ops = [
+        UpdateOne(
+            {"team_key": team["_id"]},
+            {
+                "$set": {
+                    "member_count": team["member_count"],
+                    "paid_count": team["paid_count"],
+                    "unpaid_count": team["member_count"] - team["paid_count"],
+                    "updated_at": now,
+                },
+                "$setOnInsert": {"team_name": team["team_name"].strip()},
+            },
+            upsert=True,
+        )
+        for team in counts
+    ]
+    if ops:
+        await db.teams.bulk_write(ops, ordered=False)
+
+    seen = [team["_id"] for team in counts]
+    untouched = {"updated_at": {"$not": {"$gte": started}}}
+    if keys is None:
+        await db.teams.delete_many({"team_key": {"$nin": seen}, **untouched})
+    else:
+        await db.teams.delete_many({"team_key": {"$in": sorted(set(keys) - set(seen))}, **untouched})
+
+async def refresh_teams_of(query: dict):
+    """Recount the teams of the registrations matching `query` after their payment changed."""
+    try:
+        keys = await db.registrations.distinct("team_key", {**query, "team_key": {"$ne": None}})
+        await refresh_teams(keys)
+    except Exception:
+        logger.exception("Failed to refresh teams after a payment update")
+
+async def backfill_team_keys() -> int:
+    """Give registrations from before team keys existed one; returns how many were updated."""
+    updated = 0
+    rows = db.registrations.find(
+        {"team_key": {"$exists": False}, "team_name": {"$nin": [None, ""]}},
+        {"_id": 0, "id": 1, "team_name": 1},
+    ).batch_size(STREAM_BATCH_SIZE)
+
+    ops = []
+    async for row in rows:
+        ops.append(UpdateOne({"id": row["id"]}, {"$set": {"team_key": normalize_team_name(row["team_name"])}}))
+        if len(ops) >= BULK_BATCH_SIZE:
+            updated += (await db.registrations.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        updated += (await db.registrations.bulk_write(ops, ordered=False)).modified_count
+    return updated
+
+# -------------------------------------------------------------------
+# LIVE EVENTS
+# -------------------------------------------------------------------
+
+class EventBroker:
+    """Fan one upstream of registration events out to connected admins.
+
+    Each event is encoded as an SSE frame once and handed to every
+    subscriber's bounded queue. A subscriber that falls behind loses its
+    oldest frames instead of slowing down the publisher.
+    """
+
+    def __init__(self, queue_max: int):
+        self.queue_max = queue_max
+        self.subscribers = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_max)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, kind: str, data: dict):
+        if not self.subscribers:
+            return
+
+        frame = f"event: {kind}\ndata: {json.dumps(data, default=json_default)}\n\n"
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(frame)
+
+event_broker = EventBroker(EVENT_SUBSCRIBER_QUEUE_MAX)
+
+# ADMIN_EVENTS_SOURCE with "auto" resolved at startup.
+events_source = "local"
+
+async def resolve_events_source() -> str:
+    if ADMIN_EVENTS_SOURCE != "auto":
+        return ADMIN_EVENTS_SOURCE
+    try:
+        hello = await client.admin.command("hello")
+    except Exception:
+        logger.warning("Could not inspect the Mongo deployment; live events use the local source", exc_info=True)
+        return "local"
+    if hello.get("setName") or hello.get("msg") == "isdbgrid":
+        return "changestream"
+    logger.warning("Standalone Mongo: live events only show writes made by the worker serving each stream")
+    return "local"
+
+def publish_registration(registration: "Registration"):
+    if events_source == "local":
+        event_broker.publish("registration", registration.model_dump(include=set(EVENT_FIELDS)))
+
+def payment_event(doc: dict, previous_status: Optional[str] = None) -> dict:
+    """A payment change for the dashboard; previous_status is None when unknown."""
+    return {
+        "order_id": doc.get("order_id"),
+        "registration_id": doc.get("registration_id"),
+        "payment_status": doc.get("payment_status"),
+        "previous_status": previous_status,
+        "amount": doc.get("amount"),
+    }
+
+def publish_payment(doc: dict, previous_status: Optional[str]):
+    """Publish a registration's stored payment state; only call it for rows a write changed."""
+    if events_source == "local":
+        event_broker.publish("payment", payment_event(doc, previous_status))
+
+async def issue_event_ticket(subject: str) -> str:
+    ticket = secrets.token_urlsafe(32)
+    await db.event_tickets.insert_one({
+        "_id": token_key(ticket),
+        "subject": subject,
+        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=EVENT_TICKET_TTL_SECONDS),
+    })
+    return ticket
+
+async def redeem_event_ticket(ticket: str) -> str:
+    """Consume a ticket and return its subject; each ticket opens one stream."""
+    doc = await db.event_tickets.find_one_and_delete({
+        "_id": token_key(ticket),
+        "expires_at": {"$gt": datetime.now(timezone.utc)},
+    })
+    if not doc:
+        raise HTTPException(status_code=401, detail="Invalid or expired ticket")
+    return doc["subject"]
+
+async def watch_registrations():
+    """Feed the broker from a change stream, resuming after errors.
+
+    Update events carry no pre-image, so payment events from here have no
+    previous_status; the dashboard falls back to what it already shows.
+    """
+    pipeline = [{"$match": {"$or": [
+        {"operationType": "insert"},
+        # Reviving an archived registration replaces its stub.
+        {"operationType": "replace", "fullDocument.archived": {"$ne": True}},
+        {"operationType": "update", "updateDescription.updatedFields.payment_status": {"$exists": True}},
+    ]}}]
+    resume_token = None
+
+    while True:
+        try:
+            async with db.registrations.watch(
+                pipeline,
+                full_document="updateLookup",
+                resume_after=resume_token,
+            ) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    doc = change.get("fullDocument") or {}
+                    if change["operationType"] in ("insert", "replace"):
+                        event_broker.publish("registration", {k: doc.get(k) for k in EVENT_FIELDS})
+                    else:
+                        event_broker.publish("payment", payment_event(doc))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Registration change stream failed; reconnecting")
+            await asyncio.sleep(1)
+
+# -------------------------------------------------------------------
+# INDEX MANAGER
+# -------------------------------------------------------------------
+
+async def ensure_indexes() -> List[str]:
+    """Create missing declared indexes and return a list of drift findings.
+
+    Safe to run on every startup. Indexes whose options differ from the
+    declaration are reported, not rebuilt: dropping an index on a live
+    collection is left to an operator. A declared unique index that is
+    missing or not unique raises instead, since writes rely on it to
+    reject duplicates (e.g. existing duplicate emails block its build).
+    """
+    drift, unenforced = [], []
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        declared = set()
+
+        for model in models:
+            spec = model.document
+            name = spec["name"]
+            declared.add(name)
+
+            current = existing.get(name)
+            if current is None:
+                try:
+                    await collection.create_indexes([model])
+                except OperationFailure as exc:
+                    drift.append(f"{collection_name}.{name}: could not be created ({exc})")
+                    if spec.get("unique"):
+                        unenforced.append(f"{collection_name}.{name}")
+                continue
+
+            for option in INDEX_OPTIONS:
+                if current.get(option) != spec.get(option):
+                    drift.append(
+                        f"{collection_name}.{name}: {option} is {current.get(option)!r}, "
+                        f"declared {spec.get(option)!r}"
+                    )
+            if spec.get("unique") and not current.get("unique"):
+                unenforced.append(f"{collection_name}.{name}")
+
+        for name in sorted(existing.keys() - declared - {"_id_"}):
+            drift.append(f"{collection_name}.{name}: exists but is not declared")
+
+    for finding in drift:
+        logger.warning("Index drift: %s", finding)
+    if unenforced:
+        raise RuntimeError(f"Unique indexes not in place: {', '.join(unenforced)}")
+    return drift
+
+# -------------------------------------------------------------------
+# BACKGROUND TASKS
+# -------------------------------------------------------------------
+
+async def run_periodically(interval: float, job, name: str):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:
+            logger.exception("Background job %s failed", name)
+
+async def monitor_loop_lag():
+    """Measure how late a fixed sleep wakes up; anything over zero is loop blocking."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL_SECONDS)
+        lag = max(0.0, loop.time() - start - LOOP_LAG_INTERVAL_SECONDS)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_HISTOGRAM.observe(lag)
+
+class Pacer:
+    """Space out starts to at most `rate` a second across all callers; 0 means unpaced."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_start = 0.0
+
+    async def wait(self):
+        now = asyncio.get_running_loop().time()
+        start = max(now, self.next_start)
+        self.next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+def start_background_task(coro):
+    background_tasks.append(asyncio.create_task(coro))
+
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
+# -------------------------------------------------------------------
+# BATCHING
+# -------------------------------------------------------------------
+
+class MicroBatcher:
+    """Coalesce items submitted by many coroutines into batched writes.
+
+    A batch is flushed once `max_size` items are waiting or `max_wait`
+    seconds after its first item arrived. Subclasses implement write(),
+    which resolves each item's future; an exception fails the whole batch.
+    """
+
+    def __init__(self, name: str, max_size: int, max_wait: float, queue_max: int = 0):
+        self.name = name
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.queue: asyncio.Queue = asyncio.Queue(queue_max)
+
+    async def submit(self, item):
+        """Queue an item and wait for the batch that carries it."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    def submit_nowait(self, item) -> asyncio.Future:
+        """Queue an item without waiting; raises asyncio.QueueFull."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((item, future))
+        return future
+
+    async def write(self, batch: list):
+        raise NotImplementedError
+
+    async def _write(self, batch: list):
+        try:
+            await self.write(batch)
+        except Exception as exc:
+            logger.exception("Batch write for %s failed", self.name)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._write(batch)
+
+    async def flush_pending(self):
+        """Write whatever is still queued; used on shutdown."""
+        while not self.queue.empty():
+            batch = []
+            while len(batch) < self.max_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self._write(batch)
+
+# -------------------------------------------------------------------
+# JOBS
+# -------------------------------------------------------------------
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_DEAD = "dead"
+
+def new_job(kind: str, payload: dict, dedupe_key: str) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "kind": kind,
+        "payload": payload,
+        "dedupe_key": dedupe_key,
+        "status": JOB_QUEUED,
+        "attempts": 0,
+        "run_at": now,
+        "created_at": now,
+    }
+
+async def enqueue_jobs(jobs: List[dict]):
+    """Write jobs to the outbox; a dedupe_key that is already queued is skipped.
+
+    The outbox write follows the data write rather than sharing a
+    transaction with it, so a failure here is logged and never fails the
+    request that caused it.
+    """
+    if not jobs:
+        return
+    try:
+        await db.jobs.insert_many(jobs, ordered=False)
+    except BulkWriteError as exc:
+        if any(e["code"] != 11000 for e in exc.details.get("writeErrors", [])):
+            logger.exception("Failed to enqueue %d jobs", len(jobs))
+    except Exception:
+        logger.exception("Failed to enqueue %d jobs", len(jobs))
+    job_runner.wake()
+
+def registration_confirmation_job(registration: "Registration") -> dict:
+    return new_job(
+        "registration_confirmation",
+        {
+            "registration_id": registration.registration_id,
+            "email": registration.email,
+            "full_name": registration.full_name,
+        },
+        f"registration_confirmation:{registration.registration_id}",
+    )
+
+def payment_receipt_job(transition: "PaymentTransition") -> dict:
+    return new_job(
+        "payment_receipt",
+        {"order_id": transition.order_id, "payment_id": transition.payment_id},
+        f"payment_receipt:{transition.payment_id}",
+    )
+
+mail_executor = ThreadPoolExecutor(max_workers=SMTP_MAX_WORKERS, thread_name_prefix="smtp")
+
+def deliver_mail(message: EmailMessage):
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=JOB_TIMEOUT_SECONDS) as smtp:
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USER:
+            smtp.login(SMTP_USER, SMTP_PASSWORD or "")
+        smtp.send_message(message)
+
+async def send_mail(to: str, subject: str, body: str):
+    if not SMTP_HOST:
+        logger.info("SMTP_HOST not set; mail to %s not sent: %s", to, subject)
+        return
+
+    message = EmailMessage()
+    message["From"] = SMTP_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(mail_executor, deliver_mail, message)
+
+async def send_registration_confirmation(payload: dict):
+    await send_mail(
+        payload["email"],
+        "You're registered for the Neuron hackathon",
+        f"Hi {payload['full_name']},\n\n"
+        f"Your registration ID is {payload['registration_id']}. "
+        "Keep it handy for payment and check-in.\n\nNeuron Club\n",
+    )
+
+async def send_payment_receipt(payload: dict):
+    # Transitions are enqueued before we know they applied; only a payment
+    # that actually landed on the registration gets a receipt.
+    registration = await db.registrations.find_one(
+        {"order_id": payload["order_id"], "transaction_id": payload["payment_id"], "payment_status": PAID_STATUS},
+        {"_id": 0, "email": 1, "full_name": 1, "registration_id": 1, "amount": 1},
+    )
+    if not registration:
+        return
+
+    amount = f"INR {registration['amount'] / 100:.2f}" if registration.get("amount") else "your registration fee"
+    await send_mail(
+        registration["email"],
+        "Payment received - Neuron hackathon",
+        f"Hi {registration['full_name']},\n\n"
+        f"We received {amount} for registration {registration['registration_id']}.\n"
+        f"Payment ID: {payload['payment_id']}\nOrder ID: {payload['order_id']}\n\nNeuron Club\n",
+    )
+
+JOB_HANDLERS = {
+    "registration_confirmation": send_registration_confirmation,
+    "payment_receipt": send_payment_receipt,
+}
+
+class JobRunner:
+    """Drain the jobs outbox with `workers` coroutines, at most `rate` job starts a second.
+
+    Claiming a job moves its run_at to twice JOB_TIMEOUT_SECONDS ahead,
+    which doubles as a lease: if the process dies mid-job, the job becomes
+    claimable again once that passes. Failures retry with jittered
+    exponential backoff until JOB_MAX_ATTEMPTS, then the job is parked as dead.
+    """
+
+    def __init__(self, workers: int, rate: float):
+        self.workers = workers
+        self.pacer = Pacer(rate)
+        self._wakeup = asyncio.Event()
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await db.jobs.find_one_and_update(
+            {"status": {"$in": [JOB_QUEUED, JOB_RUNNING]}, "run_at": {"$lte": now}},
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "run_at": now + timedelta(seconds=JOB_TIMEOUT_SECONDS * 2),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def execute(self, job: dict):
+        now = datetime.now(timezone.utc)
+        try:
+            handler = JOB_HANDLERS[job["kind"]]
+            await asyncio.wait_for(handler(job["payload"]), JOB_TIMEOUT_SECONDS)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if job["attempts"] >= JOB_MAX_ATTEMPTS or job["kind"] not in JOB_HANDLERS:
+                logger.error("Job %s (%s) is dead after %d attempts: %s",
+                             job["_id"], job["kind"], job["attempts"], error)
+                update = {"status": JOB_DEAD, "last_error": error}
+            else:
+                delay = random.uniform(0, JOB_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1))
+                update = {
+                    "status": JOB_QUEUED,
+                    "run_at": now + timedelta(seconds=delay),
+                    "last_error": error,
+                }
+        else:
+            update = {
+                "status": JOB_DONE,
+                "completed_at": now,
+                "expires_at": now + timedelta(days=JOB_RETENTION_DAYS),
+            }
+        await db.jobs.update_one({"_id": job["_id"]}, {"$set": update})
+
+    async def work(self):
+        while True:
+            await self.pacer.wait()
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self.execute(job)
+            except Exception:
+                # The lease runs out and another claim retries the job.
+                logger.exception("Recording the outcome of job %s failed", job["_id"])
+
+    async def run(self):
+        await asyncio.gather(*(self.work() for _ in range(self.workers)))
+
+job_runner = JobRunner(JOB_WORKERS, JOB_RATE_PER_SECOND)
+
+# -------------------------------------------------------------------
+# PAYMENT UPDATES
+# -------------------------------------------------------------------
+
+# Razorpay webhook events we act on, mapped to the resulting payment_status.
+WEBHOOK_EVENTS = {
+    "payment.captured": PAID_STATUS,
+    "order.paid": PAID_STATUS,
+    "payment.failed": FAILED_STATUS,
+}
+
+def razorpay_signature(secret: str, message: bytes) -> str:
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+def webhook_transition(event: dict) -> Optional[PaymentTransition]:
+    status = WEBHOOK_EVENTS.get(event.get("event"))
+    payment = event.get("payload", {}).get("payment", {}).get("entity", {})
+    if not status or not payment.get("order_id") or not payment.get("id"):
+        return None
+
+    return PaymentTransition(
+        order_id=payment["order_id"],
+        payment_id=payment["id"],
+        status=status,
+        amount=payment.get("amount"),
+    )
+
+def payment_transition_op(transition: PaymentTransition) -> UpdateOne:
+    """Build an update that applies a transition at most once.
+
+    A payment id that was already recorded never matches again, a completed
+    registration is never touched, and a failure only moves a pending one.
+    """
+    query = {
+        "order_id": transition.order_id,
+        "transaction_id": {"$ne": transition.payment_id},
+        "payment_status": {"$ne": PAID_STATUS},
+    }
+    if transition.status == FAILED_STATUS:
+        query["payment_status"] = PENDING_STATUS
+    if transition.registration_id:
+        query["registration_id"] = transition.registration_id
+
+    return UpdateOne(query, {"$set": {
+        "payment_status": transition.status,
+        "transaction_id": transition.payment_id,
+        "payment_updated_at": datetime.now(timezone.utc),
+    }})
+
+PAYMENT_STATE_FIELDS = {
+    "_id": 0, "registration_id": 1, "order_id": 1,
+    "payment_status": 1, "transaction_id": 1, "amount": 1,
+}
+
+async def payment_states(order_ids: List[str]) -> Dict[str, dict]:
+    """Payment fields of the registrations holding these orders, by registration_id."""
+    docs = await db.registrations.find(
+        {"order_id": {"$in": order_ids}}, PAYMENT_STATE_FIELDS,
+    ).to_list(None)
+    return {doc["registration_id"]: doc for doc in docs}
+
+def changed_payments(before: Dict[str, dict], after: Dict[str, dict]) -> List[Tuple[dict, dict]]:
+    """(before, after) pairs for registrations whose status or payment id moved."""
+    return [
+        (before[key], doc)
+        for key, doc in after.items()
+        if key in before and (
+            before[key].get("payment_status"), before[key].get("transaction_id")
+        ) != (doc.get("payment_status"), doc.get("transaction_id"))
+    ]
+
+class PaymentUpdateBatcher(MicroBatcher):
+    """Apply queued payment transitions with one bulk_write per batch.
+
+    Each submit() resolves to whether its transition changed the row.
+    """
+
+    async def write(self, batch: list):
+        transitions = [item for item, _ in batch]
+        order_ids = list({t.order_id for t in transitions})
+
+        # bulk_write only reports totals, and a guarded op may not apply, so
+        # the rows are read before and after: the counters then move from
+        # each row's real previous status by its stored amount.
+        before = await payment_states(order_ids)
+        result = await db.registrations.bulk_write(
+            [payment_transition_op(t) for t in transitions],
+            ordered=False
+        )
+        changed = changed_payments(before, await payment_states(order_ids)) if result.modified_count else []
+
+        for old, new in changed:
+            registration_stats.record_transition(
+                new["payment_status"], new.get("amount"), previous=old["payment_status"],
+            )
+
+        # Published from the stored rows, so a transition the guard skipped
+        # (say a late failure after capture) never reaches the dashboard.
+        for old, doc in changed:
+            publish_payment(doc, old.get("payment_status"))
+        await enqueue_jobs([payment_receipt_job(t) for t in transitions if t.status == PAID_STATUS])
+        if result.modified_count:
+            await refresh_teams_of({"order_id": {"$in": [t.order_id for t in transitions]}})
+
+        applied = {(new["order_id"], new["registration_id"], new.get("transaction_id"), new["payment_status"])
+                   for _, new in changed}
+        for transition, future in batch:
+            if not future.done():
+                future.set_result(any(
+                    key[0] == transition.order_id
+                    and key[2:] == (transition.payment_id, transition.status)
+                    and transition.registration_id in (None, key[1])
+                    for key in applied
+                ))
+
+# Real servers name the index in errmsg ("index: email_1 dup key"); mongomock
+# appends the error document instead.
+DUPLICATE_KEY_INDEX = re.compile(r"index: (\w+?)_-?1 dup key|'keyPattern': \{'(\w+)'")
+
+def duplicate_key_field(details: Optional[dict]) -> Optional[str]:
+    """The field whose unique index a duplicate-key error hit, or None.
+
+    Bulk write errors may carry keyValue without keyPattern, or neither,
+    so those and then the index name in errmsg are tried in turn.
+    """
+    details = details or {}
+    for key in ("keyPattern", "keyValue"):
+        if details.get(key):
+            return next(iter(details[key]))
+    match = DUPLICATE_KEY_INDEX.search(details.get("errmsg") or "")
+    return (match.group(1) or match.group(2)) if match else None
+
+async def registrations_added(registrations: List[Registration]):
+    """Stats, live events, team counts and the confirmation mail for newly stored registrations."""
+    for registration in registrations:
+        registration_stats.record_registration(registration)
+        publish_registration(registration)
+    await record_team_members(registrations)
+    await enqueue_jobs([registration_confirmation_job(r) for r in registrations])
+
+async def insert_registrations(registrations: List[Registration]) -> Dict[int, dict]:
+    """Insert with one unordered insert_many; returns write errors by list index.
+
+    The unique indexes do the dedupe: rows that hit one fail on their own
+    while the rest of the batch still lands.
+    """
+    errors = {}
+    try:
+        await db.registrations.insert_many(
+            [registration.model_dump() for registration in registrations],
+            ordered=False
+        )
+    except BulkWriteError as exc:
+        errors = {e["index"]: e for e in exc.details.get("writeErrors", [])}
+
+    await registrations_added([r for index, r in enumerate(registrations) if index not in errors])
+    return errors
+
+class RegistrationBatcher(MicroBatcher):
+    """Insert queued registrations with one insert_many per batch.
+
+    Rows that hit a unique index get their own DuplicateKeyError.
+    """
+
+    async def write(self, batch: list):
+        errors = await insert_registrations([registration for registration, _ in batch])
+
+        for index, (registration, future) in enumerate(batch):
+            error = errors.get(index)
+            if error is None:
+                result = registration
+            elif error["code"] == 11000:
+                result = DuplicateKeyError(error["errmsg"], error["code"], error)
+            else:
+                result = OperationFailure(error["errmsg"], error["code"], error)
+
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+registration_ingest = RegistrationBatcher(
+    "registration ingest",
+    INGEST_BATCH_SIZE,
+    INGEST_BATCH_WAIT_MS / 1000,
+    INGEST_QUEUE_MAX,
+)
+
+payment_updates = PaymentUpdateBatcher(
+    "payment updates",
+    PAYMENT_BATCH_SIZE,
+    PAYMENT_BATCH_WAIT_MS / 1000,
+    PAYMENT_QUEUE_MAX,
+)
+
+# -------------------------------------------------------------------
+# PAYMENT RECONCILER
+# -------------------------------------------------------------------
+
+def reconciled_transition(registration: dict, payments: List[dict]) -> Optional[PaymentTransition]:
+    """What the gateway's view of an order means for a pending registration, if anything."""
+    captured = [p for p in payments if p.get("status") == "captured"]
+    if captured:
+        payment, status = captured[0], PAID_STATUS
+    elif payments and all(p.get("status") == "failed" for p in payments):
+        payment, status = max(payments, key=lambda p: p.get("created_at", 0)), FAILED_STATUS
+    else:
+        return None  # never attempted, or authorized and still settling
+
+    return PaymentTransition(
+        order_id=registration["order_id"],
+        payment_id=payment["id"],
+        status=status,
+        registration_id=registration["registration_id"],
+        amount=payment.get("amount"),
+    )
+
+class PaymentReconciler:
+    """Walk pending registrations with an order, oldest first, and settle them from the gateway.
+
+    Progress is a keyset cursor in `checkpoints`, saved after every page,
+    so a sweep cut short by RECONCILE_MAX_PER_RUN, a restart or an open
+    circuit breaker resumes where it stopped. The pass starts over once it
+    reaches the end. Results go through the payment update batcher, so
+    stats, live events and receipts follow as for any other payment.
+    """
+
+    checkpoint_id = "payment_reconciler"
+
+    def __init__(self, concurrency: int, rate: float):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.pacer = Pacer(rate)
+
+    def lease_until(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=max(RECONCILE_INTERVAL_SECONDS, 60))
+
+    async def acquire(self) -> Optional[dict]:
+        """Take the sweep lease; None while another worker holds it."""
+        try:
+            return await db.checkpoints.find_one_and_update(
+                {"_id": self.checkpoint_id, "$or": [
+                    {"lease_until": None},
+                    {"lease_until": {"$lte": datetime.now(timezone.utc)}},
+                ]},
+                {"$set": {"lease_until": self.lease_until()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return None
+
+    async def save(self, cursor: Optional[str], release: bool = False):
+        await db.checkpoints.update_one({"_id": self.checkpoint_id}, {"$set": {
+            "cursor": cursor,
+            "lease_until": None if release else self.lease_until(),
+            "updated_at": datetime.now(timezone.utc),
+        }})
+
+    async def check(self, registration: dict) -> Optional[PaymentTransition]:
+        async with self.slots:
+            await self.pacer.wait()
+            payments = await call_gateway("fetch_order_payments", registration["order_id"])
+        return reconciled_transition(registration, payments)
+
+    async def page(self, cursor: Optional[str]) -> List[dict]:
+        query = {
+            "payment_status": PENDING_STATUS,
+            "order_id": {"$ne": None},
+            "created_at": {"$lte": datetime.now(timezone.utc) - timedelta(seconds=RECONCILE_MIN_AGE_SECONDS)},
+        }
+        if cursor:
+            query = {"$and": [query, decode_cursor(cursor, ascending=True)]}
+        return await db.registrations.find(
+            query,
+            {"_id": 0, "id": 1, "created_at": 1, "registration_id": 1, "order_id": 1},
+        ).sort([(key, 1) for key, _ in REGISTRATION_SORT]).limit(RECONCILE_PAGE_SIZE).to_list(RECONCILE_PAGE_SIZE)
+
+    async def sweep(self) -> dict:
+        checkpoint = await self.acquire()
+        if checkpoint is None:
+            return {"status": "busy"}
+
+        cursor = checkpoint.get("cursor")
+        checked = settled = 0
+        try:
+            while checked < RECONCILE_MAX_PER_RUN:
+                registrations = await self.page(cursor)
+                results = await asyncio.gather(
+                    *(self.check(r) for r in registrations), return_exceptions=True,
+                )
+                if any(isinstance(r, HTTPException) and r.status_code == 503 for r in results):
+                    # Breaker is open; keep the cursor and pick this page up next run.
+                    logger.warning("Payment reconcile paused: gateway unavailable")
+                    break
+
+                transitions = []
+                for registration, result in zip(registrations, results):
+                    if isinstance(result, BaseException):
+                        logger.warning("Reconcile of order %s failed: %r", registration["order_id"], result)
+                    elif result is not None:
+                        transitions.append(result)
+                results = await asyncio.gather(*(payment_updates.submit(t) for t in transitions))
+
+                checked += len(registrations)
+                settled += sum(results)
+                if len(registrations) < RECONCILE_PAGE_SIZE:
+                    cursor = None
+                    break
+                cursor = encode_cursor(registrations[-1])
+                await self.save(cursor)
+        finally:
+            await self.save(cursor, release=True)
+
+        if checked:
+            logger.info("Payment reconcile checked %d orders, settled %d", checked, settled)
+        return {"status": "ok", "checked": checked, "settled": settled, "resume": cursor is not None}
+
+payment_reconciler = PaymentReconciler(RECONCILE_CONCURRENCY, RECONCILE_RATE_PER_SECOND)
+
+# -------------------------------------------------------------------
+# LIFECYCLE
+# -------------------------------------------------------------------
+
+def abandoned_query(cutoff: datetime) -> dict:
+    return {"payment_status": PENDING_STATUS, "order_id": None, "created_at": {"$lt": cutoff}}
+
+async def archive_stale_registrations() -> dict:
+    """Move abandoned pending registrations to the archive, ARCHIVE_BATCH_SIZE at a time.
+
+    Each batch is copied first, then every copied row is replaced by its
+    stub. The replace re-checks the abandoned condition, so a registration
+    that got an order in between stays hot (its archive copy is removed).
+    Re-running after a crash is safe: rows copied last time are already in
+    the archive. A row whose email is held by a different archived
+    registration stays hot and is logged.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=ARCHIVE_PENDING_AFTER_HOURS)
+    archived = skipped = 0
+    cursor = None
+    team_keys = set()
+
+    while archived < ARCHIVE_MAX_PER_RUN:
+        query = abandoned_query(cutoff)
+        if cursor:
+            query = {"$and": [query, decode_cursor(cursor, ascending=True)]}
+        batch = await db.registrations.find(query, {"_id": 0}).sort(
+            [(key, 1) for key, _ in REGISTRATION_SORT]
+        ).limit(ARCHIVE_BATCH_SIZE).to_list(ARCHIVE_BATCH_SIZE)
+        if not batch:
+            break
+        cursor = encode_cursor(batch[-1])
+
+        now = datetime.now(timezone.utc)
+        try:
+            await db.registrations_archive.insert_many(
+                [{**doc, "archived_at": now} for doc in batch], ordered=False,
+            )
+        except BulkWriteError as exc:
+            if any(e["code"] != 11000 for e in exc.details.get("writeErrors", [])):
+                raise
+
+        ids = [doc["registration_id"] for doc in batch]
+        copied = set(await db.registrations_archive.distinct("registration_id", {"registration_id": {"$in": ids}}))
+        skipped += len(ids) - len(copied)
+        stubbed = 0
+        if copied:
+            result = await db.registrations.bulk_write([
+                ReplaceOne(
+                    {**abandoned_query(cutoff), "registration_id": doc["registration_id"]},
+                    {"email": doc["email"], "registration_id": doc["registration_id"], "archived": True},
+                )
+                for doc in batch if doc["registration_id"] in copied
+            ], ordered=False)
+            stubbed = result.modified_count
+        if stubbed < len(copied):
+            kept = await db.registrations.distinct(
+                "registration_id", {"registration_id": {"$in": sorted(copied)}, "archived": {"$ne": True}},
+            )
+            await db.registrations_archive.delete_many({"registration_id": {"$in": kept}})
+
+        archived += stubbed
+        team_keys.update(doc["team_key"] for doc in batch if doc.get("team_key"))
+        if len(batch) < ARCHIVE_BATCH_SIZE:
+            break
+
+    if skipped:
+        logger.warning("Left %d abandoned registrations hot: email already in the archive", skipped)
+    if archived:
+        registration_stats.invalidate()
+        await refresh_teams(sorted(team_keys))
+        logger.info("Archived %d abandoned registrations", archived)
+    return {"archived": archived}
+
+async def revive_archived(registration: Registration) -> bool:
+    """Put registration in place of its stub and drop the archive copy.
+
+    False if no stub holds its registration_id any more, e.g. a concurrent
+    request revived it first.
+    """
+    result = await db.registrations.replace_one(
+        {"registration_id": registration.registration_id, "archived": True},
+        registration.model_dump(),
+    )
+    if not result.modified_count:
+        return False
+    await db.registrations_archive.delete_one({"registration_id": registration.registration_id})
+    await registrations_added([registration])
+    return True
+
+async def revive_archived_email(registration: Registration) -> bool:
+    """Revive the archived registration whose stub holds registration.email.
+
+    registration keeps its new details and takes the archived ids. False
+    if the email belongs to a live registration.
+    """
+    stub = await db.registrations.find_one(
+        {"email": registration.email, "archived": True}, {"_id": 0, "registration_id": 1},
+    )
+    if not stub:
+        return False
+    archived = await db.registrations_archive.find_one(
+        {"registration_id": stub["registration_id"]}, {"_id": 0, "id": 1},
+    )
+    registration.registration_id = stub["registration_id"]
+    if archived:
+        registration.id = archived["id"]
+    return await revive_archived(registration)
+
+# -------------------------------------------------------------------
+# ADMIN ROUTES
+# -------------------------------------------------------------------
+
+@api_router.post("/auth/admin-login")
+async def admin_login(credentials: AdminLogin, request: Request):
+    ip = client_ip(request)
+    if ip is not None:
+        keys = (f"user:{credentials.username}|ip:{ip}", f"ip:{ip}")
+        retry_after = login_limiter.retry_after(*keys)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many login attempts",
+                headers={"Retry-After": str(retry_after)},
+            )
+    else:
+        keys = (f"user:{credentials.username}",)
+        delay = login_limiter.delay(keys[0])
+        if delay:
+            await asyncio.sleep(delay)
+
+    admin = await db.admins.find_one({"username": credentials.username})
+    if not admin or not await run_hash(
+        bcrypt.checkpw,
+        credentials.password.encode(),
+        admin["hashed_password"].encode()
+    ):
+        login_limiter.record(*keys)
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    login_limiter.reset(*keys)
+    token = create_access_token({"sub": credentials.username})
+    return {"access_token": token, "token_type": "bearer"}
+
+@api_router.post("/auth/logout")
+async def admin_logout(authorization: str = Header(None)):
+    token = bearer_token(authorization)
+    await authenticate(token)
+    await revoke_token(token)
+    return {"status": "logged_out"}
+
+@api_router.post("/auth/refresh")
+async def refresh_token(authorization: str = Header(None)):
+    token = bearer_token(authorization)
+    subject = await authenticate(token)
+    await revoke_token(token)
+    return {"access_token": create_access_token({"sub": subject}), "token_type": "bearer"}
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(authorization: str = Header(None)):
+    if METRICS_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+    for batcher in (registration_ingest, payment_updates):
+        QUEUE_DEPTH.set(batcher.queue.qsize(), batcher.name)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# -------------------------------------------------------------------
+# REGISTRATION ROUTES
+# -------------------------------------------------------------------
+
+async def insert_registration(registration: Registration):
+    if REGISTRATION_INGEST_MODE == "batched":
+        await registration_ingest.submit(registration)
+    else:
+        await db.registrations.insert_one(registration.model_dump())
+        await registrations_added([registration])
+
+@api_router.post("/registrations", response_model=Registration, dependencies=[Depends(shed_load)])
+async def create_registration(reg: RegistrationCreate, request: Request):
+    await ip_limit.check(client_ip(request))
+    await email_limit.check(reg.email.lower())
+    if reg.honeypot:
+        raise HTTPException(status_code=400, detail="Invalid submission")
+
+    registration = Registration(
+        registration_id=new_registration_id(),
+        full_name=reg.full_name,
+        email=reg.email,
+        phone=reg.phone,
+        college=reg.college,
+        team_name=reg.team_name
+    )
+
+    # The unique email index rejects duplicates, saving a find_one round
+    # trip. Only when it fires is the email checked for an archive stub:
+    # coming back revives that registration, with the new details and the
+    # original ids, rather than adding another.
+    for attempt in range(REGISTRATION_ID_ATTEMPTS):
+        try:
+            await insert_registration(registration)
+            return registration
+        except DuplicateKeyError as exc:
+            field = duplicate_key_field(exc.details)
+            if field == "email":
+                if await revive_archived_email(registration):
+                    return registration
+                raise HTTPException(status_code=400, detail="Email already registered")
+            if field != "registration_id" or attempt == REGISTRATION_ID_ATTEMPTS - 1:
+                raise
+            registration.registration_id = new_registration_id()
+
+@api_router.get("/registrations", response_model=List[Registration])
+async def get_registrations(
+    response: Response,
+    query: dict = Depends(registration_filters),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    _: str = Depends(verify_token),
+):
+    ascending = order == "asc"
+    if cursor:
+        after = decode_cursor(cursor, ascending)
+        query = {"$and": [query, after]} if query else after
+
+    selected = parse_fields(fields)
+    projection = {"_id": 0, **{f: 1 for f in selected or []}}
+    if selected is None and REGISTRATION_SERIALIZER == "trusted":
+        # Unvalidated rows go out as stored, so Mongo drops what the model
+        # does not declare (payment_updated_at, archive stubs' flag, ...).
+        projection.update({f: 1 for f in Registration.model_fields})
+    sort = [(key, 1) for key, _ in REGISTRATION_SORT] if ascending else REGISTRATION_SORT
+    rows = admin_db.registrations.find(query, projection).sort(sort)
+
+    # NDJSON streams straight off the Motor cursor, one batch in memory at
+    # a time; without a limit it walks the rest of the collection.
+    if format == "ndjson":
+        if limit:
+            rows = rows.limit(limit)
+        return StreamingResponse(
+            stream_ndjson(
+                rows.batch_size(STREAM_BATCH_SIZE),
+                validate=selected is None and REGISTRATION_SERIALIZER != "trusted",
+            ),
+            media_type="application/x-ndjson",
+        )
+
+    limit = limit or PAGE_SIZE_DEFAULT
+    page = await rows.limit(limit).to_list(limit)
+    headers = {}
+    if len(page) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(page[-1])
+
+    # Returning a Response bypasses response_model. Projected rows would
+    # fail its validation anyway; full rows take the configured fast path.
+    if selected or REGISTRATION_SERIALIZER != "model":
+        return Response(
+            registration_list_body(page, projected=selected is not None),
+            media_type="application/json",
+            headers=headers,
+        )
+    response.headers.update(headers)
+    return page
+
+@api_router.get("/registrations/stats")
+async def get_registration_stats(_: str = Depends(verify_token)):
+    if registration_stats.stale:
+        await registration_stats.reconcile()
+    return registration_stats.snapshot()
+
+@api_router.post("/registrations/events/ticket")
+async def registration_events_ticket(subject: str = Depends(verify_token)):
+    """A single-use ticket for opening the events stream, valid for EVENT_TICKET_TTL_SECONDS."""
+    return {"ticket": await issue_event_ticket(subject), "expires_in": EVENT_TICKET_TTL_SECONDS}
+
+@api_router.get("/registrations/events")
+async def registration_events(ticket: Optional[str] = None, authorization: str = Header(None)):
+    """Server-Sent Events feed of new registrations and payment updates.
+
+    EventSource cannot set headers, so browsers pass a ticket from
+    POST /registrations/events/ticket as ?ticket=; the bearer token itself
+    never goes in the URL.
+    """
+    if ticket:
+        await redeem_event_ticket(ticket)
+    else:
+        await authenticate(bearer_token(authorization))
+    queue = event_broker.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            event_broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.get("/registrations/export")
+async def export_registrations(
+    query: dict = Depends(registration_filters),
+    columns: Optional[str] = None,
+    gzip: bool = False,
+    _: str = Depends(verify_token),
+):
+    selected = parse_export_columns(columns)
+    projection = {"_id": 0, **{c: 1 for c in selected}}
+    rows = (
+        admin_db.registrations.find(query, projection)
+        .sort(REGISTRATION_SORT)
+        .batch_size(STREAM_BATCH_SIZE)
+    )
+
+    headers = {"Content-Disposition": "attachment; filename=neuron_registrations.csv"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        stream_csv(rows, selected, compress=gzip),
+        media_type="text/csv",
+        headers=headers,
+    )
+
+# -------------------------------------------------------------------
+# BULK ADMIN ROUTES
+# -------------------------------------------------------------------
+
+async def import_batch(batch: list, report: BulkReport):
+    registrations = [
+        Registration(registration_id=new_registration_id(), **reg.model_dump(exclude={"honeypot"}))
+        for _, reg in batch
+    ]
+
+    # Rows whose generated registration_id was taken get a new one, like a sign-up.
+    errors, pending = {}, list(range(len(batch)))
+    for attempt in range(REGISTRATION_ID_ATTEMPTS):
+        failed = await insert_registrations([registrations[index] for index in pending])
+        errors.update({pending[position]: error for position, error in failed.items()})
+        pending = [
+            pending[position] for position, error in failed.items()
+            if error["code"] == 11000 and duplicate_key_field(error) == "registration_id"
+        ]
+        if not pending or attempt == REGISTRATION_ID_ATTEMPTS - 1:
+            break
+        for index in pending:
+            del errors[index]
+            registrations[index].registration_id = new_registration_id()
+
+    for index, (row, _) in enumerate(batch):
+        error = errors.get(index)
+        if error is None:
+            report.succeeded += 1
+        elif error["code"] == 11000 and duplicate_key_field(error) == "email":
+            # Like a sign-up, an archived email revives that registration.
+            if await revive_archived_email(registrations[index]):
+                report.succeeded += 1
+            else:
+                report.fail(row, "Email already registered")
+        else:
+            report.fail(row, error["errmsg"])
+
+def registration_update_op(update: RegistrationUpdate) -> UpdateOne:
+    now = datetime.now(timezone.utc)
+    changes = {}
+    if update.payment_status is not None:
+        changes["payment_status"] = update.payment_status
+        changes["payment_updated_at"] = now
+    if update.transaction_id is not None:
+        changes["transaction_id"] = update.transaction_id
+    if update.amount is not None:
+        changes["amount"] = update.amount
+    if update.checked_in is not None:
+        changes["checked_in_at"] = now if update.checked_in else None
+    return UpdateOne({"registration_id": update.registration_id, "archived": {"$ne": True}}, {"$set": changes})
+
+async def update_batch(batch: list, report: BulkReport):
+    # One indexed read per batch, so unknown ids are reported per row
+    # instead of disappearing into bulk_write's matched_count. It also
+    # gives the payment state the live dashboard deltas are diffed against.
+    ids = [update.registration_id for _, update in batch]
+    existing = {
+        doc["registration_id"]: doc
+        for doc in await db.registrations.find(
+            {"registration_id": {"$in": ids}, "archived": {"$ne": True}}, PAYMENT_STATE_FIELDS,
+        ).to_list(None)
+    }
+
+    ops, op_rows = [], []
+    for row, update in batch:
+        if update.registration_id not in existing:
+            report.fail(row, "Registration not found")
+            continue
+        ops.append(registration_update_op(update))
+        op_rows.append(row)
+    if not ops:
+        return
+
+    errors = {}
+    try:
+        await db.registrations.bulk_write(ops, ordered=False)
+    except BulkWriteError as exc:
+        errors = {e["index"]: e for e in exc.details.get("writeErrors", [])}
+
+    for index, row in enumerate(op_rows):
+        if index in errors:
+            report.fail(row, errors[index]["errmsg"])
+        else:
+            report.succeeded += 1
+
+    if any(update.payment_status or update.amount is not None for _, update in batch):
+        registration_stats.invalidate()
+    if any(update.payment_status for _, update in batch):
+        after = await db.registrations.find(
+            {"registration_id": {"$in": ids}}, PAYMENT_STATE_FIELDS,
+        ).to_list(None)
+        for old, doc in changed_payments(existing, {doc["registration_id"]: doc for doc in after}):
+            publish_payment(doc, old.get("payment_status"))
+        await refresh_teams_of({"registration_id": {"$in": ids}})
+
+@api_router.post("/registrations/archive")
+async def archive_registrations(_: str = Depends(verify_token)):
+    """Archive abandoned pending registrations now instead of waiting for the next interval."""
+    if not ARCHIVE_PENDING_AFTER_HOURS:
+        raise HTTPException(status_code=409, detail="Archiving is disabled")
+    return await archive_stale_registrations()
+
+@api_router.post("/registrations/import")
+async def import_registrations(request: Request, _: str = Depends(verify_token)):
+    """Bulk-create registrations from a CSV or NDJSON upload of RegistrationCreate rows."""
+    return await apply_upload(request, RegistrationCreate, import_batch)
+
+@api_router.post("/registrations/bulk-update")
+async def bulk_update_registrations(request: Request, _: str = Depends(verify_token)):
+    """Record offline payments and check-ins from a CSV or NDJSON upload keyed by registration_id."""
+    return await apply_upload(request, RegistrationUpdate, update_batch)
+
+# -------------------------------------------------------------------
+# TEAM ROUTES
+# -------------------------------------------------------------------
+
+@api_router.get("/teams", response_model=List[Team])
+async def get_teams(
+    response: Response,
+    unpaid: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(TEAM_PAGE_SIZE_DEFAULT, ge=1, le=TEAM_PAGE_SIZE_MAX),
+    _: str = Depends(verify_token),
+):
+    """Teams in key order; `unpaid=true` keeps only teams with an unpaid member."""
+    query = {"unpaid_count": {"$gt": 0}} if unpaid else {}
+    if cursor:
+        try:
+            after = base64.urlsafe_b64decode(cursor.encode()).decode()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["team_key"] = {"$gt": after}
+
+    teams = await admin_db.teams.find(query, {"_id": 0}).sort("team_key", ASCENDING).limit(limit).to_list(limit)
+    if len(teams) == limit:
+        response.headers["X-Next-Cursor"] = base64.urlsafe_b64encode(teams[-1]["team_key"].encode()).decode()
+    return teams
+
+@api_router.get("/teams/{key}")
+async def get_team(key: str, _: str = Depends(verify_token)):
+    """One team with its members; `key` may be the team key or any spelling of the name."""
+    team_key = normalize_team_name(key)
+    team = await admin_db.teams.find_one({"team_key": team_key}, {"_id": 0})
+    if not team:
+        raise HTTPException(status_code=404, detail="Team not found")
+
+    members = await admin_db.registrations.find(
+        {"team_key": team_key},
+        {"_id": 0, **{field: 1 for field in TEAM_MEMBER_FIELDS}},
+    ).sort(REGISTRATION_SORT).to_list(None)
+    return {**Team.model_validate(team).model_dump(), "members": members}
+
+@api_router.post("/teams/rebuild")
+async def rebuild_teams(_: str = Depends(verify_token)):
+    """Recompute every team from registrations, backfilling team keys on older rows first."""
+    backfilled = await backfill_team_keys()
+    await refresh_teams()
+    return {"backfilled": backfilled, "teams": await db.teams.count_documents({})}
+
+# -------------------------------------------------------------------
+# PAYMENTS
+# -------------------------------------------------------------------
+
+def order_response(order_id: str, amount: int) -> dict:
+    return {"order_id": order_id, "amount": amount, "key_id": RAZORPAY_KEY_ID}
+
+async def open_payment_order(data: PaymentOrderCreate) -> dict:
+    """Return the registration's unpaid order for this amount, creating one if needed."""
+    projection = {"_id": 0, "order_id": 1, "amount": 1, "payment_status": 1, "archived": 1}
+    registration = await db.registrations.find_one({"registration_id": data.registration_id}, projection)
+
+    # Ordering again brings an archived registration back. If a concurrent
+    # request revives it first, the re-read picks up theirs.
+    if registration and registration.get("archived"):
+        archived = await db.registrations_archive.find_one(
+            {"registration_id": data.registration_id}, {"_id": 0, "archived_at": 0},
+        )
+        if archived:
+            await revive_archived(Registration.model_validate({**archived, "created_at": datetime.now(timezone.utc)}))
+        registration = await db.registrations.find_one(
+            {"registration_id": data.registration_id, "archived": {"$ne": True}}, projection,
+        )
+    if not registration:
+        raise HTTPException(status_code=404, detail="Registration not found")
+    if registration.get("payment_status") == PAID_STATUS:
+        raise HTTPException(status_code=409, detail="Registration already paid")
+
+    # An order stays payable until it is paid, so a retry reuses it.
+    if registration.get("order_id") and registration.get("amount") == data.amount:
+        return order_response(registration["order_id"], data.amount)
+
+    order = await call_gateway("create_order", {
+        "amount": data.amount,
+        "currency": "INR",
+        "payment_capture": 1
+    })
+
+    # Only replace the order we read; if another worker stored one first,
+    # hand out theirs so the client never pays against a superseded order.
+    result = await db.registrations.update_one(
+        {"registration_id": data.registration_id, "order_id": registration.get("order_id")},
+        {"$set": {"order_id": order["id"], "amount": data.amount}}
+    )
+    if not result.matched_count:
+        current = await db.registrations.find_one(
+            {"registration_id": data.registration_id},
+            {"_id": 0, "order_id": 1, "amount": 1},
+        )
+        if current and current.get("order_id") and current.get("amount") == data.amount:
+            return order_response(current["order_id"], data.amount)
+        raise HTTPException(status_code=409, detail="Order changed concurrently, please retry")
+
+    return order_response(order["id"], order["amount"])
+
+@api_router.post("/payment/create-order", dependencies=[Depends(shed_load)])
+async def create_payment_order(
+    data: PaymentOrderCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+):
+    await ip_limit.check(client_ip(request))
+    await order_limit.check(data.registration_id)
+
+    # An Idempotency-Key replays its result for IDEMPOTENCY_TTL_SECONDS.
+    # Without one, only concurrent double-clicks share a call: a later
+    # repeat goes back to open_payment_order, which reuses the stored open
+    # order or refuses once the registration is paid.
+    if idempotency_key:
+        key, replay = f"{data.registration_id}:key:{idempotency_key}", True
+    else:
+        key, replay = f"{data.registration_id}:amount:{data.amount}", False
+    fingerprint = f"{data.registration_id}:{data.amount}"
+    return await order_requests.run(key, fingerprint, lambda: open_payment_order(data), replay=replay)
+
+@api_router.post("/payment/verify")
+async def verify_payment(data: PaymentVerify):
+    expected = razorpay_signature(
+        RAZORPAY_KEY_SECRET,
+        f"{data.razorpay_order_id}|{data.razorpay_payment_id}".encode()
+    )
+    if not hmac.compare_digest(expected, data.razorpay_signature):
+        raise HTTPException(status_code=400, detail="Invalid payment signature")
+
+    applied = await payment_updates.submit(PaymentTransition(
+        order_id=data.razorpay_order_id,
+        payment_id=data.razorpay_payment_id,
+        status=PAID_STATUS,
+        registration_id=data.registration_id,
+    ))
+    if not applied:
+        # A retried verify, or the webhook, may have recorded this payment
+        # already; anything else means it did not land on the registration.
+        registration = await db.registrations.find_one(
+            {"order_id": data.razorpay_order_id, "registration_id": data.registration_id},
+            {"_id": 0, "payment_status": 1, "transaction_id": 1},
+        )
+        if not registration:
+            raise HTTPException(status_code=400, detail="Order does not belong to this registration")
+        paid = registration.get("payment_status") == PAID_STATUS
+        if not paid or registration.get("transaction_id") != data.razorpay_payment_id:
+            detail = "Registration already paid" if paid else "Payment was not recorded"
+            raise HTTPException(status_code=409, detail=detail)
+    return {"status": "verified", "registration_id": data.registration_id}
+
+@api_router.post("/payment/webhook")
+async def payment_webhook(request: Request, x_razorpay_signature: str = Header(None)):
+    if not RAZORPAY_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook not configured")
+
+    body = await request.body()
+    expected = razorpay_signature(RAZORPAY_WEBHOOK_SECRET, body)
+    if not x_razorpay_signature or not hmac.compare_digest(expected, x_razorpay_signature):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
+
+    try:
+        transition = webhook_transition(json.loads(body))
+    except (ValueError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+
+    # Acknowledge as soon as the event is queued. A full queue answers 503
+    # so Razorpay redelivers later instead of the event being dropped.
+    if transition:
+        try:
+            payment_updates.submit_nowait(transition)
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Busy, retry later")
+
+    return {"status": "ok"}
+
+@api_router.post("/payment/reconcile")
+async def reconcile_payments(_: str = Depends(verify_token)):
+    """Run one reconcile sweep now instead of waiting for the next interval."""
+    return await payment_reconciler.sweep()
+
+# -------------------------------------------------------------------
+# APP CONFIG
+# -------------------------------------------------------------------
+
+CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[origin.strip() for origin in CORS_ORIGINS.split(",") if origin.strip()],
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
+)
+
+app.add_middleware(MetricsMiddleware)
+app.include_router(api_router)
+
+# -------------------------------------------------------------------
+# STARTUP
+# -------------------------------------------------------------------
+
+async def startup():
+    global events_source
+    connect_mongo()
+    connect_gateway()
+    logger.info(
+        "Worker %d connected to Mongo (maxPoolSize=%d, admin reads=%s)",
+        client_pid, MONGO_MAX_POOL_SIZE, MONGO_ADMIN_READ_PREFERENCE,
+    )
+    await ensure_indexes()
+    if worker_lease and REGISTRATION_ID_WORKER is None:
+        await worker_lease.acquire()
+
+    if not await db.admins.find_one({"username": "admin"}):
+        hashed = (await run_hash(
+            bcrypt.hashpw,
+            ADMIN_PASSWORD.encode(),
+            bcrypt.gensalt()
+        )).decode()
+
+        # Another worker may have seeded the admin between the check and here.
+        try:
+            await db.admins.insert_one(Admin(
+                username="admin",
+                hashed_password=hashed
+            ).model_dump())
+        except DuplicateKeyError:
+            pass
 
-        await db.admins.insert_one(Admin(
-            username="admin",
-            hashed_password=hashed
-        ).model_dump())
+    start_background_task(run_periodically(
+        STATS_TTL_SECONDS,
+        lambda: registration_stats.reconcile(force=True),
+        "stats reconcile",
+    ))
+    start_background_task(payment_updates.run())
+    start_background_task(monitor_loop_lag())
+    events_source = await resolve_events_source()
+    logger.info("Live admin events source: %s", events_source)
+    if events_source == "changestream":
+        start_background_task(watch_registrations())
+    if REGISTRATION_INGEST_MODE == "batched":
+        start_background_task(registration_ingest.run())
+    if worker_lease and REGISTRATION_ID_WORKER is None:
+        start_background_task(run_periodically(
+            REGISTRATION_ID_LEASE_SECONDS / 3,
+            worker_lease.renew,
+            "registration id worker lease",
+        ))
+    if JOB_WORKERS > 0:
+        start_background_task(job_runner.run())
+    if ARCHIVE_PENDING_AFTER_HOURS > 0:
+        start_background_task(run_periodically(
+            ARCHIVE_INTERVAL_SECONDS,
+            archive_stale_registrations,
+            "archive stale registrations",
+        ))
+    if TEAMS_REFRESH_SECONDS > 0:
+        start_background_task(run_periodically(TEAMS_REFRESH_SECONDS, refresh_teams, "teams refresh"))
+    if RECONCILE_INTERVAL_SECONDS > 0:
+        start_background_task(run_periodically(
+            RECONCILE_INTERVAL_SECONDS,
+            payment_reconciler.sweep,
+            "payment reconcile",
+        ))
 
-@app.on_event("shutdown")
 async def shutdown():
+    await stop_background_tasks()
+    await registration_ingest.flush_pending()
+    await payment_updates.flush_pending()
+    if worker_lease:
+        await worker_lease.release()
+    gateway_executor.shutdown(wait=False)
+    hash_executor.shutdown(wait=False)
+    mail_executor.shutdown(wait=False)
     client.close()
@@ -0,0 +1,44 @@
+"""Shared fixtures: server.py against an in-memory mongomock database.
+
+The environment server.py validates on import is filled with throwaway
+values first, the same ones the benchmark scripts use.
+"""
+
+import asyncio
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import _env  # noqa: E402,F401
+import pytest  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Recorded first so the test's client and counters are undone afterwards.
+    for name in ("client", "client_pid", "db", "admin_db"):
+        monkeypatch.setattr(server, name, getattr(server, name))
+    monkeypatch.setattr(server, "registration_stats", server.RegistrationStats())
+    server.use_client(AsyncMongoMockClient())
+    asyncio.run(server.ensure_indexes())
+    yield server.db
+
+
+@pytest.fixture
+def registration():
+    """registration(n, **fields): a registration document numbered n, fields overriding the defaults."""
+    def make(n, **fields):
+        return server.Registration(**{
+            "registration_id": f"NEUTEST{n:04d}",
+            "full_name": f"User {n}",
+            "email": f"user{n}@example.com",
+            "phone": "9876543210",
+            "college": "College",
+            **fields,
+        }).model_dump()
+    return make
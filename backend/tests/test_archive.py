@@ -0,0 +1,153 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+
+
+@pytest.fixture
+def aged(registration):
+    """A registration created over two hours ago; a higher n is older."""
+    return lambda n, **fields: registration(
+        n, created_at=datetime.now(timezone.utc) - timedelta(hours=2, minutes=n), **fields,
+    )
+
+
+@pytest.fixture
+def archived(db, aged, monkeypatch):
+    """archived(*docs): store the docs and run the archive sweep over them."""
+    monkeypatch.setattr(server, "ARCHIVE_PENDING_AFTER_HOURS", 1)
+
+    async def make(*docs):
+        await db.registrations.insert_many([dict(doc) for doc in docs])
+        return await server.archive_stale_registrations()
+    return make
+
+
+def sign_up(email, name):
+    request = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": ("10.0.0.1", 1)})
+    reg = server.RegistrationCreate(full_name=name, email=email, phone="9876543210", college="College")
+    return server.create_registration(reg, request)
+
+
+def test_archive_leaves_a_stub_holding_the_email(db, aged, archived, monkeypatch):
+    monkeypatch.setattr(server, "ARCHIVE_BATCH_SIZE", 1)
+
+    async def scenario():
+        fresh = server.Registration(registration_id="NEUTEST0009", full_name="Fresh", email="f@example.com",
+                                    phone="9876543210", college="College").model_dump()
+        result = await archived(aged(1), aged(2, order_id="order_2"), aged(3), fresh)
+        rows = await db.registrations.find({}, {"_id": 0}).sort("registration_id", 1).to_list(None)
+        copies = await db.registrations_archive.distinct("registration_id")
+        await server.registration_stats.reconcile(force=True)
+        stats = server.registration_stats.snapshot()
+        return result, rows, copies, stats
+
+    result, rows, copies, stats = asyncio.run(scenario())
+    assert result == {"archived": 2}
+    assert rows[0] == {"email": "user1@example.com", "registration_id": "NEUTEST0001", "archived": True}
+    assert rows[1]["order_id"] == "order_2"
+    assert rows[2] == {"email": "user3@example.com", "registration_id": "NEUTEST0003", "archived": True}
+    assert sorted(copies) == ["NEUTEST0001", "NEUTEST0003"]
+    assert stats["total_registrations"] == 2
+
+
+def test_archive_rerun_stubs_rows_copied_before_a_crash(db, aged, monkeypatch):
+    monkeypatch.setattr(server, "ARCHIVE_PENDING_AFTER_HOURS", 1)
+
+    async def scenario():
+        doc = aged(1)
+        await db.registrations.insert_one(dict(doc))
+        await db.registrations_archive.insert_one(dict(doc))
+        result = await server.archive_stale_registrations()
+        stub = await db.registrations.find_one({}, {"_id": 0})
+        return result, stub, await db.registrations_archive.count_documents({})
+
+    result, stub, copies = asyncio.run(scenario())
+    assert result == {"archived": 1}
+    assert stub["archived"] is True
+    assert copies == 1
+
+
+def test_sign_up_only_reads_the_archive_when_a_stub_holds_the_email(db, aged, archived, monkeypatch):
+    monkeypatch.setattr(server, "rate_limit_store", server.MemoryBucketStore(100))
+    reads = []
+    find_one = server.db.registrations_archive.find_one
+
+    async def counted_find_one(*args, **kwargs):
+        reads.append(args)
+        return await find_one(*args, **kwargs)
+
+    async def scenario():
+        await archived(aged(1, email="a@example.com"))
+        monkeypatch.setattr(server.db.registrations_archive, "find_one", counted_find_one)
+        await sign_up("new@example.com", "New User")
+        reads_for_new = len(reads)
+        revived = await sign_up("a@example.com", "Back Again")
+        with pytest.raises(HTTPException) as taken:
+            await sign_up("a@example.com", "Someone Else")
+        stored = await db.registrations.find_one({"email": "a@example.com"}, {"_id": 0})
+        return reads_for_new, revived, taken.value, stored, await db.registrations_archive.count_documents({})
+
+    reads_for_new, revived, taken, stored, copies = asyncio.run(scenario())
+    assert reads_for_new == 0
+    assert revived.registration_id == "NEUTEST0001"
+    assert taken.status_code == 400
+    assert stored["full_name"] == "Back Again"
+    assert "archived" not in stored
+    assert copies == 0
+
+
+def test_import_revives_an_archived_email(db, aged, archived):
+    rows = [
+        server.RegistrationCreate(full_name="Back Again", email="a@example.com", phone="9876543210", college="College"),
+        server.RegistrationCreate(full_name="New User", email="b@example.com", phone="9876543210", college="College"),
+        server.RegistrationCreate(full_name="Duplicate", email="b@example.com", phone="9876543210", college="College"),
+    ]
+
+    async def scenario():
+        await archived(aged(1, email="a@example.com"))
+        report = server.BulkReport()
+        await server.import_batch(list(enumerate(rows, start=1)), report)
+        revived = await db.registrations.find_one({"email": "a@example.com"}, {"_id": 0})
+        return report.as_dict(), revived, await db.registrations_archive.count_documents({})
+
+    report, revived, copies = asyncio.run(scenario())
+    assert report["succeeded"] == 2
+    assert [e["error"] for e in report["errors"]] == ["Email already registered"]
+    assert revived["registration_id"] == "NEUTEST0001"
+    assert revived["full_name"] == "Back Again"
+    assert copies == 0
+
+
+def test_order_restores_an_archived_registration_with_archiving_disabled(db, aged, archived, monkeypatch):
+    monkeypatch.setattr(server, "payment_gateway", server.FakeGateway())
+    data = server.PaymentOrderCreate(
+        amount=50000, registration_id="NEUTEST0001",
+        full_name="User 1", email="user1@example.com", phone="9876543210",
+    )
+
+    async def scenario():
+        await archived(aged(1))
+        monkeypatch.setattr(server, "ARCHIVE_PENDING_AFTER_HOURS", 0)
+        order = await server.open_payment_order(data)
+        restored = await db.registrations.find_one({"registration_id": "NEUTEST0001"}, {"_id": 0})
+        return order, restored, await db.registrations_archive.count_documents({})
+
+    order, restored, copies = asyncio.run(scenario())
+    assert restored["order_id"] == order["order_id"]
+    assert restored["full_name"] == "User 1"
+    assert copies == 0
+
+
+def test_stubs_are_left_out_of_admin_lists(db, aged, archived, registration):
+    async def scenario():
+        await archived(aged(1))
+        await db.registrations.insert_one(registration(2))
+        rows = await db.registrations.find(server.registration_filters(None, None, None, None, None)).to_list(None)
+        return [row["registration_id"] for row in rows]
+
+    assert asyncio.run(scenario()) == ["NEUTEST0002"]
@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+import server
+
+
+def test_bulk_offline_payment_publishes_a_delta_per_changed_row(db, registration):
+    updates = [
+        server.RegistrationUpdate(registration_id="NEUTEST0001", payment_status="completed", amount=50000),
+        server.RegistrationUpdate(registration_id="NEUTEST0002", checked_in=True),
+        server.RegistrationUpdate(registration_id="NEUTEST9999", payment_status="completed"),
+    ]
+
+    async def scenario():
+        await db.registrations.insert_many([registration(1), registration(2)])
+        events = server.event_broker.subscribe()
+        report = server.BulkReport()
+        try:
+            await server.update_batch(list(enumerate(updates, start=1)), report)
+        finally:
+            server.event_broker.unsubscribe(events)
+        frames = []
+        while not events.empty():
+            frames.append(events.get_nowait())
+        return report, frames
+
+    report, frames = asyncio.run(scenario())
+    assert report.as_dict()["succeeded"] == 2
+    assert report.errors == [{"row": 3, "error": "Registration not found"}]
+    assert len(frames) == 1
+    event = json.loads(frames[0].split("data: ", 1)[1])
+    assert event == {
+        "order_id": None, "registration_id": "NEUTEST0001", "payment_status": "completed",
+        "previous_status": "pending", "amount": 50000,
+    }
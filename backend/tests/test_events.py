@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_event_ticket_opens_one_stream(db):
+    async def scenario():
+        ticket = await server.issue_event_ticket("admin")
+        first = await server.redeem_event_ticket(ticket)
+        with pytest.raises(HTTPException) as reused:
+            await server.redeem_event_ticket(ticket)
+        return first, reused.value
+
+    subject, reused = asyncio.run(scenario())
+    assert subject == "admin"
+    assert reused.status_code == 401
+
+
+def test_expired_event_ticket_is_rejected(db, monkeypatch):
+    monkeypatch.setattr(server, "EVENT_TICKET_TTL_SECONDS", -1)
+
+    async def scenario():
+        ticket = await server.issue_event_ticket("admin")
+        await server.redeem_event_ticket(ticket)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(scenario())
+    assert exc.value.status_code == 401
+
+
+def test_event_stream_takes_no_token_in_the_url():
+    route = next(r for r in server.app.routes if getattr(r, "path", None) == "/api/registrations/events")
+    assert [param.name for param in route.dependant.query_params] == ["ticket"]
+
+
+class FakeAdmin:
+    def __init__(self, hello):
+        self.hello = hello
+
+    async def command(self, name):
+        if isinstance(self.hello, Exception):
+            raise self.hello
+        return self.hello
+
+
+@pytest.mark.parametrize("hello, source", [
+    ({"isWritablePrimary": True, "setName": "rs0"}, "changestream"),
+    ({"isWritablePrimary": True, "msg": "isdbgrid"}, "changestream"),
+    ({"isWritablePrimary": True}, "local"),
+    (NotImplementedError("hello"), "local"),
+])
+def test_auto_events_source_follows_the_deployment(monkeypatch, hello, source):
+    monkeypatch.setattr(server, "ADMIN_EVENTS_SOURCE", "auto")
+    monkeypatch.setattr(server, "client", type("Client", (), {"admin": FakeAdmin(hello)})())
+    assert asyncio.run(server.resolve_events_source()) == source
+
+
+def test_payment_events_carry_the_previous_status(db, registration):
+    async def scenario():
+        await db.registrations.insert_one(registration(1, order_id="order_1", amount=50000))
+        events = server.event_broker.subscribe()
+        try:
+            loop = asyncio.get_running_loop()
+            await server.payment_updates.write([(server.PaymentTransition(
+                order_id="order_1", payment_id="pay_1", status=server.PAID_STATUS,
+            ), loop.create_future())])
+            return events.get_nowait()
+        finally:
+            server.event_broker.unsubscribe(events)
+
+    frame = asyncio.run(scenario())
+    payload = json.loads(frame.split("data: ", 1)[1])
+    assert payload["previous_status"] == server.PENDING_STATUS
+    assert payload["payment_status"] == server.PAID_STATUS
+    assert payload["amount"] == 50000
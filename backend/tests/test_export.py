@@ -0,0 +1,26 @@
+import asyncio
+import csv
+import io
+
+import server
+
+
+def test_formula_cells_are_exported_as_text(db, registration):
+    async def scenario():
+        await db.registrations.insert_many([
+            registration(1, full_name="=HYPERLINK(\"http://evil\",\"x\")"),
+            registration(2, full_name="+1-2", college="@SUM(A1)"),
+            registration(3, full_name="\tTabbed", college="-College"),
+            registration(4, full_name="Plain Name", amount=-5),
+        ])
+        rows = db.registrations.find({}, sort=[("registration_id", 1)])
+        chunks = [chunk async for chunk in server.stream_csv(rows, ["full_name", "college", "amount"])]
+        return list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+
+    rows = asyncio.run(scenario())
+    assert rows[1:] == [
+        ["'=HYPERLINK(\"http://evil\",\"x\")", "College", ""],
+        ["'+1-2", "'@SUM(A1)", ""],
+        ["'\tTabbed", "'-College", ""],
+        ["Plain Name", "College", "-5"],
+    ]
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+
+
+class Counted:
+    """An async call that records how often it ran and can be held open."""
+
+    def __init__(self, result="order_1"):
+        self.result = result
+        self.calls = 0
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        return self.result
+
+
+def test_keyed_result_is_replayed():
+    cache = server.IdempotencyCache(10, 60)
+    call = Counted()
+
+    async def scenario():
+        return [await cache.run("k", "f", call) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["order_1"] * 3
+    assert call.calls == 1
+
+
+def test_in_flight_only_entry_is_shared_then_dropped():
+    cache = server.IdempotencyCache(10, 60)
+    call = Counted()
+
+    async def scenario():
+        call.release = asyncio.Event()
+        first = asyncio.create_task(cache.run("k", "f", call, replay=False))
+        second = asyncio.create_task(cache.run("k", "f", call, replay=False))
+        await asyncio.sleep(0)
+        call.release.set()
+        concurrent = await asyncio.gather(first, second)
+        calls_while_in_flight = call.calls
+        await cache.run("k", "f", call, replay=False)
+        return concurrent, calls_while_in_flight
+
+    concurrent, calls_while_in_flight = asyncio.run(scenario())
+    assert concurrent == ["order_1", "order_1"]
+    assert calls_while_in_flight == 1
+    assert call.calls == 2
+    assert "k" not in cache.entries
+
+
+def test_key_reused_for_a_different_request_is_rejected():
+    cache = server.IdempotencyCache(10, 60)
+
+    async def scenario():
+        await cache.run("k", "amount:50000", Counted())
+        await cache.run("k", "amount:90000", Counted())
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(scenario())
+    assert exc.value.status_code == 422
+
+
+def test_failures_are_not_cached():
+    cache = server.IdempotencyCache(10, 60)
+    call = Counted()
+
+    async def failing():
+        raise HTTPException(status_code=502, detail="Payment gateway error")
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await cache.run("k", "f", failing)
+        return await cache.run("k", "f", call)
+
+    assert asyncio.run(scenario()) == "order_1"
+    assert call.calls == 1
+
+
+def test_order_without_key_is_refused_once_paid(db, registration, monkeypatch):
+    monkeypatch.setattr(server, "payment_gateway", server.FakeGateway())
+    monkeypatch.setattr(server, "rate_limit_store", server.MemoryBucketStore(100))
+    monkeypatch.setattr(server, "order_requests", server.IdempotencyCache(10, 600))
+    request = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": ("10.0.0.1", 1)})
+    data = server.PaymentOrderCreate(
+        amount=50000, registration_id="NEUTEST0001",
+        full_name="User 1", email="user1@example.com", phone="9876543210",
+    )
+
+    async def scenario():
+        await db.registrations.insert_one(registration(1))
+        order = await server.create_payment_order(data, request, idempotency_key=None)
+        again = await server.create_payment_order(data, request, idempotency_key=None)
+        loop = asyncio.get_running_loop()
+        await server.payment_updates.write([(server.PaymentTransition(
+            order_id=order["order_id"], payment_id="pay_1", status=server.PAID_STATUS,
+            registration_id="NEUTEST0001",
+        ), loop.create_future())])
+        with pytest.raises(HTTPException) as paid:
+            await server.create_payment_order(data, request, idempotency_key=None)
+        return order, again, paid.value
+
+    order, again, paid = asyncio.run(scenario())
+    assert again == order
+    assert paid.status_code == 409
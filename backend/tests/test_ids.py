@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+class Clock:
+    """A settable time.time() stand-in."""
+
+    def __init__(self, now=1767225600.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def snowflake(worker_id=1, clock=None):
+    return server.SnowflakeIdGenerator(worker_id, clock=clock or Clock())
+
+
+def test_ids_sort_in_creation_order_across_milliseconds():
+    clock = Clock()
+    generate = snowflake(clock=clock)
+    ids = []
+    for _ in range(50):
+        ids.extend(generate() for _ in range(3))
+        clock.now += 0.001
+
+    assert len(set(ids)) == len(ids)
+    assert sorted(ids) == ids
+
+
+def test_sequence_rollover_borrows_the_next_millisecond():
+    generate = snowflake()
+    ids = [generate() for _ in range(3 * 4096)]
+
+    assert len(set(ids)) == len(ids)
+    assert sorted(ids) == ids
+    assert generate.last_ms == int(Clock()() * 1000) + 2
+
+
+def test_clock_stepping_back_keeps_ids_increasing():
+    clock = Clock()
+    generate = snowflake(clock=clock)
+    before = [generate() for _ in range(3)]
+    clock.now -= 5
+    after = [generate() for _ in range(3)]
+
+    assert sorted(before + after) == before + after
+    assert len(set(before + after)) == 6
+
+
+def test_workers_minting_in_the_same_millisecond_never_collide():
+    first, second = snowflake(1), snowflake(2)
+    assert {first() for _ in range(100)}.isdisjoint(second() for _ in range(100))
+
+
+def test_leases_hand_out_distinct_worker_ids(db):
+    async def scenario():
+        leases = [server.WorkerIdLease(snowflake(None)) for _ in range(20)]
+        return [await lease.acquire() for lease in leases], leases
+
+    worker_ids, leases = asyncio.run(scenario())
+    assert len(set(worker_ids)) == 20
+    assert [lease.generator.worker_id for lease in leases] == [0] * 20  # not minted yet
+    assert all(lease.generator() for lease in leases)
+    assert [lease.generator.worker_id for lease in leases] == worker_ids
+
+
+def test_expired_lease_is_reclaimed_and_its_old_owner_moves_on(db, monkeypatch):
+    monkeypatch.setattr(server, "REGISTRATION_ID_WORKERS", 2)
+
+    async def scenario():
+        stalled, other = server.WorkerIdLease(snowflake(None)), server.WorkerIdLease(snowflake(None))
+        taken = {await stalled.acquire(), await other.acquire()}
+        await db.id_workers.update_one(
+            {"_id": stalled.worker_id},
+            {"$set": {"lease_until": datetime.now(timezone.utc) - timedelta(seconds=1)}},
+        )
+        newcomer = server.WorkerIdLease(snowflake(None))
+        reclaimed = await newcomer.acquire()
+        lost = stalled.worker_id
+        await stalled.renew()
+        return taken, reclaimed, lost, stalled
+
+    taken, reclaimed, lost, stalled = asyncio.run(scenario())
+    assert taken == {0, 1}
+    assert reclaimed == lost
+    # Every id is held again, so the stalled worker falls back to its hashed id.
+    assert stalled.worker_id is None
+    assert stalled.generator.leased_worker is None
+
+
+def test_import_retries_a_taken_registration_id(db, registration, monkeypatch):
+    ids = iter(["NEUTEST0001", "NEUTEST0002"])
+    monkeypatch.setattr(server, "new_registration_id", lambda: next(ids))
+    row = server.RegistrationCreate(full_name="New User", email="new@example.com", phone="9876543210", college="College")
+
+    async def scenario():
+        await db.registrations.insert_one(registration(1))
+        report = server.BulkReport()
+        await server.import_batch([(1, row)], report)
+        stored = await db.registrations.find_one({"email": "new@example.com"})
+        return report.as_dict(), stored["registration_id"]
+
+    report, registration_id = asyncio.run(scenario())
+    assert (report["succeeded"], report["errors"]) == (1, [])
+    assert registration_id == "NEUTEST0002"
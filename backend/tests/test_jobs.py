@@ -0,0 +1,139 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+SINK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "smtp_sink.py")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+    """Start benchmarks/smtp_sink.py with a given --fail-rate and point the mailer at it."""
+    sinks = []
+
+    def start(fail_rate):
+        port = free_port()
+        sink = subprocess.Popen(
+            [sys.executable, SINK, "--port", str(port), "--fail-rate", str(fail_rate), "--report-every", "60"],
+            stdout=subprocess.PIPE, text=True,
+        )
+        sinks.append(sink)
+        assert "listening" in sink.stdout.readline()
+        monkeypatch.setattr(server, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(server, "SMTP_PORT", port)
+        monkeypatch.setattr(server, "SMTP_STARTTLS", False)
+
+    yield start
+    for sink in sinks:
+        sink.terminate()
+        sink.wait()
+
+
+@pytest.fixture
+def jobs(db, monkeypatch):
+    monkeypatch.setattr(server, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(server, "JOB_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(server, "JOB_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(server, "job_runner", server.JobRunner(workers=2, rate=0))
+    return db.jobs
+
+
+@pytest.fixture
+def confirmation(registration):
+    """confirmation(n): the confirmation mail job for registration n."""
+    return lambda n: server.registration_confirmation_job(server.Registration(**registration(n)))
+
+
+async def enqueue(*jobs):
+    await server.enqueue_jobs(list(jobs))
+
+
+async def claim_and_run():
+    job = await server.job_runner.claim()
+    await server.job_runner.execute(job)
+    return job
+
+
+def test_outbox_dedupes_on_key(jobs, confirmation):
+    async def scenario():
+        await enqueue(confirmation(1))
+        await enqueue(confirmation(1))
+        await enqueue(confirmation(1), confirmation(2))
+        return await jobs.count_documents({})
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_worker_pool_delivers_to_sink(jobs, smtp_sink, confirmation):
+    smtp_sink(fail_rate=0)
+
+    async def scenario():
+        for n in range(5):
+            await enqueue(confirmation(n))
+        runner = asyncio.create_task(server.job_runner.run())
+        try:
+            for _ in range(200):
+                if await jobs.count_documents({"status": server.JOB_DONE}) == 5:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+        return await jobs.find({}).to_list(None)
+
+    for job in asyncio.run(scenario()):
+        assert job["status"] == server.JOB_DONE
+        assert job["attempts"] == 1
+        assert job["expires_at"] > datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def test_rejected_mail_retries_then_goes_dead(jobs, smtp_sink, confirmation):
+    smtp_sink(fail_rate=1)
+
+    async def scenario():
+        await enqueue(confirmation(1))
+        await claim_and_run()
+        first = await jobs.find_one({})
+        await claim_and_run()
+        second = await jobs.find_one({})
+        leftover = await server.job_runner.claim()
+        return first, second, leftover
+
+    first, second, leftover = asyncio.run(scenario())
+    assert first["status"] == server.JOB_QUEUED
+    assert first["attempts"] == 1
+    assert "451" in first["last_error"]
+    assert second["status"] == server.JOB_DEAD
+    assert second["attempts"] == server.JOB_MAX_ATTEMPTS
+    assert leftover is None
+
+
+def test_claim_is_a_lease(jobs, confirmation):
+    async def scenario():
+        await enqueue(confirmation(1))
+        claimed = await server.job_runner.claim()
+        while_leased = await server.job_runner.claim()
+        # The worker died: its lease runs out and the job is claimed again.
+        await jobs.update_one({"_id": claimed["_id"]}, {"$set": {
+            "run_at": datetime.now(timezone.utc) - timedelta(seconds=1),
+        }})
+        reclaimed = await server.job_runner.claim()
+        return claimed, while_leased, reclaimed
+
+    claimed, while_leased, reclaimed = asyncio.run(scenario())
+    assert claimed["status"] == server.JOB_RUNNING
+    assert while_leased is None
+    assert reclaimed["_id"] == claimed["_id"]
+    assert reclaimed["attempts"] == 2
@@ -0,0 +1,54 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+
+import server
+
+
+def list_page(cursor=None, order="desc", limit=10):
+    """One /registrations page of registration_ids, and its next cursor."""
+    query = server.registration_filters(None, None, None, None, None)
+    result = server.get_registrations(Response(), query, cursor, limit, order, "registration_id", "json", "admin")
+    page = asyncio.run(result)
+    return [row["registration_id"] for row in json.loads(page.body)], page.headers.get("X-Next-Cursor")
+
+
+@pytest.fixture
+def seeded(db, registration):
+    """25 registrations; every three share a created_at, so `id` breaks the ties."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    docs = [registration(n, created_at=start + timedelta(seconds=n // 3)) for n in range(25)]
+    asyncio.run(db.registrations.insert_many(docs))
+    return docs
+
+
+@pytest.mark.parametrize("order", ["desc", "asc"])
+def test_cursor_walks_every_row_once_in_keyset_order(seeded, order):
+    pages, cursor = [], None
+    while True:
+        ids, cursor = list_page(cursor, order)
+        pages.append(ids)
+        if not cursor:
+            break
+
+    keyset = sorted(seeded, key=lambda doc: (doc["created_at"], doc["id"]), reverse=order == "desc")
+    assert [len(ids) for ids in pages] == [10, 10, 5]
+    assert [i for ids in pages for i in ids] == [doc["registration_id"] for doc in keyset]
+
+
+def test_rows_added_while_paging_do_not_shift_later_pages(db, seeded, registration):
+    first, cursor = list_page()
+    asyncio.run(db.registrations.insert_one(registration(99)))
+    rest, _ = list_page(cursor, limit=100)
+
+    assert "NEUTEST0099" not in first + rest
+    assert len(first + rest) == len(set(first + rest)) == 25
+
+
+def test_invalid_cursor_is_rejected(db):
+    with pytest.raises(HTTPException) as exc:
+        list_page("not-a-cursor")
+    assert exc.value.status_code == 400
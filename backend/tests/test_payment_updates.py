@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.fixture
+def pending_order(registration):
+    """A pending registration holding order_{n} for INR 500."""
+    return lambda n, **fields: registration(n, order_id=f"order_{n}", amount=50000, **fields)
+
+
+def transition(n, payment, status, **fields):
+    return server.PaymentTransition(order_id=f"order_{n}", payment_id=payment, status=status, **fields)
+
+
+async def apply(*transitions):
+    """Write the transitions as one batch; returns whether each one applied."""
+    loop = asyncio.get_running_loop()
+    batch = [(t, loop.create_future()) for t in transitions]
+    await server.payment_updates.write(batch)
+    return [future.result() for _, future in batch]
+
+
+def test_failed_then_captured_counts_from_real_previous_status(db, pending_order):
+    async def scenario():
+        await db.registrations.insert_many([pending_order(1), pending_order(2)])
+        await server.registration_stats.reconcile(force=True)
+
+        await apply(transition(1, "pay_a", server.FAILED_STATUS))
+        await apply(transition(1, "pay_b", server.PAID_STATUS))
+        # Same order retried within one batch.
+        await apply(
+            transition(2, "pay_c", server.FAILED_STATUS),
+            transition(2, "pay_d", server.PAID_STATUS),
+        )
+        return server.registration_stats
+
+    stats = asyncio.run(scenario())
+    snapshot = stats.snapshot()
+    assert snapshot["pending_registrations"] == 0
+    assert snapshot["paid_registrations"] == 2
+    assert snapshot["total_revenue_inr"] == 1000
+    assert stats.by_status[server.FAILED_STATUS] == 0
+
+
+def test_transition_without_amount_keeps_counters_fresh(db, pending_order):
+    async def scenario():
+        await db.registrations.insert_one(pending_order(1))
+        await server.registration_stats.reconcile(force=True)
+        # /payment/verify carries no amount; the stored one is used.
+        await apply(transition(1, "pay_a", server.PAID_STATUS, registration_id="NEUTEST0001"))
+        return server.registration_stats
+
+    stats = asyncio.run(scenario())
+    assert not stats.stale
+    assert stats.snapshot()["total_revenue_inr"] == 500
+
+
+def test_late_failure_after_capture_changes_nothing(db, pending_order):
+    async def scenario():
+        await db.registrations.insert_one(pending_order(1))
+        await server.registration_stats.reconcile(force=True)
+        await apply(transition(1, "pay_a", server.PAID_STATUS))
+        await apply(transition(1, "pay_b", server.FAILED_STATUS))
+        return await db.registrations.find_one({"order_id": "order_1"})
+
+    doc = asyncio.run(scenario())
+    assert doc["payment_status"] == server.PAID_STATUS
+    assert server.registration_stats.snapshot()["paid_registrations"] == 1
+
+
+def drain(queue):
+    frames = []
+    while not queue.empty():
+        frames.append(queue.get_nowait())
+    return frames
+
+
+def test_only_applied_transitions_are_published(db, pending_order):
+    async def scenario():
+        await db.registrations.insert_one(pending_order(1))
+        events = server.event_broker.subscribe()
+        try:
+            await apply(transition(1, "pay_a", server.PAID_STATUS))
+            captured = drain(events)
+            await apply(transition(1, "pay_b", server.FAILED_STATUS))
+            late_failure = drain(events)
+        finally:
+            server.event_broker.unsubscribe(events)
+        return captured, late_failure
+
+    captured, late_failure = asyncio.run(scenario())
+    assert len(captured) == 1
+    assert '"registration_id": "NEUTEST0001"' in captured[0]
+    assert '"payment_status": "completed"' in captured[0]
+    assert late_failure == []
+
+
+def test_each_transition_reports_whether_it_applied(db, pending_order):
+    async def scenario():
+        await db.registrations.insert_many([pending_order(1), pending_order(2)])
+        first = await apply(
+            transition(1, "pay_a", server.PAID_STATUS, registration_id="NEUTEST0001"),
+            transition(2, "pay_b", server.PAID_STATUS, registration_id="NEUTEST0001"),
+        )
+        again = await apply(transition(1, "pay_a", server.PAID_STATUS), transition(1, "pay_c", server.FAILED_STATUS))
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert first == [True, False]
+    assert again == [False, False]
+
+
+def verify(n, payment, registration_id=None):
+    order_id = f"order_{n}"
+    signature = server.razorpay_signature(server.RAZORPAY_KEY_SECRET, f"{order_id}|{payment}".encode())
+    return server.verify_payment(server.PaymentVerify(
+        razorpay_order_id=order_id, razorpay_payment_id=payment, razorpay_signature=signature,
+        registration_id=registration_id or f"NEUTEST{n:04d}",
+    ))
+
+
+def test_verify_reports_payments_that_did_not_land(db, pending_order, monkeypatch):
+    monkeypatch.setattr(server, "payment_updates", server.PaymentUpdateBatcher("payment updates", 100, 0.001))
+
+    async def outcome(call):
+        try:
+            return (await call)["status"]
+        except HTTPException as exc:
+            return exc.status_code
+
+    async def scenario():
+        await db.registrations.insert_many([pending_order(1), pending_order(2)])
+        writer = asyncio.create_task(server.payment_updates.run())
+        try:
+            return [
+                await outcome(verify(1, "pay_a")),
+                await outcome(verify(1, "pay_a")),
+                await outcome(verify(1, "pay_b")),
+                await outcome(verify(2, "pay_c", registration_id="NEUTEST0001")),
+            ]
+        finally:
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+
+    assert asyncio.run(scenario()) == ["verified", "verified", 409, 400]
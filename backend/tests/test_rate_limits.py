@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+
+
+def request_from(host):
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": (host, 1234)})
+
+
+def exhaust(limit, value, attempts):
+    async def scenario():
+        for _ in range(attempts):
+            await limit.check(value)
+    asyncio.run(scenario())
+
+
+def test_ip_limit_is_off_until_enabled(monkeypatch):
+    monkeypatch.setattr(server, "rate_limit_store", server.MemoryBucketStore(100))
+    limit = server.RateLimit("ip", 1, 2)
+
+    assert server.client_ip(request_from("10.0.0.1")) is None
+    exhaust(limit, server.client_ip(request_from("10.0.0.1")), 10)
+
+    monkeypatch.setattr(server, "RATE_LIMIT_BY_IP", True)
+    assert server.client_ip(request_from("10.0.0.1")) == "10.0.0.1"
+    with pytest.raises(HTTPException) as exc:
+        exhaust(limit, server.client_ip(request_from("10.0.0.1")), 3)
+    assert exc.value.status_code == 429
+
+
+@pytest.fixture
+def admin(db, monkeypatch):
+    monkeypatch.setattr(server, "login_limiter", server.LoginAttemptLimiter(3, 300, 30))
+    hashed = server.bcrypt.hashpw(b"secret", server.bcrypt.gensalt(rounds=4)).decode()
+    asyncio.run(db.admins.insert_one({"username": "admin", "hashed_password": hashed}))
+
+
+def login(password, host="10.0.0.1"):
+    async def attempt():
+        try:
+            await server.admin_login(server.AdminLogin(username="admin", password=password), request_from(host))
+            return 200
+        except HTTPException as exc:
+            return exc.status_code
+    return asyncio.run(attempt())
+
+
+def test_successful_logins_are_not_counted(admin, monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_BY_IP", True)
+    assert [login("secret") for _ in range(5)] == [200] * 5
+
+
+def test_lockout_is_per_username_and_ip(admin, monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_BY_IP", True)
+    assert [login("wrong", "10.0.0.66") for _ in range(4)] == [401, 401, 401, 429]
+    assert login("secret", "10.0.0.1") == 200
+
+
+def test_without_ip_keys_failures_slow_down_instead_of_locking_out(admin, monkeypatch):
+    monkeypatch.setattr(server.login_limiter, "max_delay", 0)
+    assert [login("wrong") for _ in range(6)] == [401] * 6
+    assert len(server.login_limiter.attempts["user:admin"]) == 6
+    assert login("secret") == 200
+    assert server.login_limiter.delay("user:admin") == 0
+
+
+def test_login_delay_doubles_up_to_the_cap():
+    limiter = server.LoginAttemptLimiter(3, 300, 10)
+    delays = []
+    for _ in range(8):
+        limiter.record("user:admin")
+        delays.append(limiter.delay("user:admin"))
+    assert delays == [0, 0, 1, 2, 4, 8, 10, 10]
+    assert limiter.retry_after("user:admin") is not None
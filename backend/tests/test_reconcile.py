@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def gateway(db, monkeypatch):
+    monkeypatch.setattr(server, "RECONCILE_MIN_AGE_SECONDS", 0)
+    monkeypatch.setattr(server, "RECONCILE_PAGE_SIZE", 10)
+    monkeypatch.setattr(server, "RECONCILE_MAX_PER_RUN", 1000)
+    monkeypatch.setattr(server, "payment_gateway", server.FakeGateway())
+    monkeypatch.setattr(server, "gateway_breaker", server.CircuitBreaker(1, 60))
+    monkeypatch.setattr(server, "payment_updates", server.PaymentUpdateBatcher("payment updates", 100, 0.001))
+    return server.payment_gateway
+
+
+@pytest.fixture
+def seed(db, gateway, registration):
+    """seed(n, *payment_statuses): a pending registration n holding a fake order with those payments."""
+    created = datetime.now(timezone.utc) - timedelta(hours=1)
+
+    async def make(n, *statuses):
+        order = gateway.create_order({"amount": 50000})
+        for status in statuses:
+            gateway.record_payment(order["id"], status)
+        await db.registrations.insert_one(registration(
+            n, order_id=order["id"], amount=50000, created_at=created + timedelta(seconds=n),
+        ))
+    return make
+
+
+async def sweep():
+    writer = asyncio.create_task(server.payment_updates.run())
+    try:
+        return await server.PaymentReconciler(4, 0).sweep()
+    finally:
+        writer.cancel()
+        await asyncio.gather(writer, return_exceptions=True)
+
+
+async def statuses(db):
+    return {
+        doc["registration_id"]: doc["payment_status"]
+        for doc in await db.registrations.find({}, {"_id": 0, "registration_id": 1, "payment_status": 1}).to_list(None)
+    }
+
+
+def test_sweep_settles_captured_and_failed_orders_only(db, seed):
+    async def scenario():
+        await seed(1, "captured")
+        await seed(2, "failed", "failed")
+        await seed(3, "authorized")
+        await seed(4)
+        await seed(5, "failed", "authorized")
+        return await sweep(), await statuses(db)
+
+    result, after = asyncio.run(scenario())
+    assert result == {"status": "ok", "checked": 5, "settled": 2, "resume": False}
+    assert after == {
+        "NEUTEST0001": server.PAID_STATUS,
+        "NEUTEST0002": server.FAILED_STATUS,
+        "NEUTEST0003": server.PENDING_STATUS,
+        "NEUTEST0004": server.PENDING_STATUS,
+        "NEUTEST0005": server.PENDING_STATUS,
+    }
+
+
+def test_sweep_resumes_from_checkpoint_after_max_per_run(db, seed, monkeypatch):
+    monkeypatch.setattr(server, "RECONCILE_PAGE_SIZE", 2)
+    monkeypatch.setattr(server, "RECONCILE_MAX_PER_RUN", 2)
+
+    async def scenario():
+        for n in range(1, 6):
+            await seed(n, "captured")
+        results = [await sweep() for _ in range(3)]
+        checkpoint = await db.checkpoints.find_one({"_id": server.PaymentReconciler.checkpoint_id})
+        return results, checkpoint, await statuses(db)
+
+    results, checkpoint, after = asyncio.run(scenario())
+    assert [(r["checked"], r["resume"]) for r in results] == [(2, True), (2, True), (1, False)]
+    assert checkpoint["cursor"] is None
+    assert checkpoint["lease_until"] is None
+    assert set(after.values()) == {server.PAID_STATUS}
+
+
+def test_sweep_is_busy_while_another_worker_holds_the_lease(db, seed):
+    async def scenario():
+        await seed(1, "captured")
+        await db.checkpoints.insert_one({
+            "_id": server.PaymentReconciler.checkpoint_id,
+            "cursor": None,
+            "lease_until": datetime.now(timezone.utc) + timedelta(minutes=5),
+        })
+        return await sweep(), await statuses(db)
+
+    result, after = asyncio.run(scenario())
+    assert result == {"status": "busy"}
+    assert after == {"NEUTEST0001": server.PENDING_STATUS}
+
+
+def test_open_breaker_pauses_the_sweep_and_keeps_the_cursor(db, seed, monkeypatch):
+    monkeypatch.setattr(server, "RECONCILE_PAGE_SIZE", 2)
+    monkeypatch.setattr(server, "RECONCILE_MAX_PER_RUN", 2)
+
+    async def scenario():
+        for n in range(1, 5):
+            await seed(n, "captured")
+        await sweep()
+        cursor = (await db.checkpoints.find_one({}))["cursor"]
+
+        server.gateway_breaker.record_failure()
+        paused = await sweep()
+        kept = (await db.checkpoints.find_one({}))["cursor"]
+        during = await statuses(db)
+
+        server.gateway_breaker.record_success()
+        resumed = await sweep()
+        return cursor, paused, kept, during, resumed, await statuses(db)
+
+    cursor, paused, kept, during, resumed, after = asyncio.run(scenario())
+    assert cursor is not None
+    assert paused == {"status": "ok", "checked": 0, "settled": 0, "resume": True}
+    assert kept == cursor
+    assert during["NEUTEST0003"] == during["NEUTEST0004"] == server.PENDING_STATUS
+    assert resumed["checked"] == 2
+    assert set(after.values()) == {server.PAID_STATUS}
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo import ASCENDING
+from starlette.requests import Request
+
+import server
+
+
+def sign_up(email, name="New User"):
+    request = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": ("10.0.0.1", 1)})
+    reg = server.RegistrationCreate(full_name=name, email=email, phone="9876543210", college="College")
+    return server.create_registration(reg, request)
+
+
+@pytest.mark.parametrize("mode", ["direct", "batched"])
+def test_duplicate_email_is_rejected_in_both_ingest_modes(db, monkeypatch, mode):
+    monkeypatch.setattr(server, "REGISTRATION_INGEST_MODE", mode)
+    monkeypatch.setattr(server, "rate_limit_store", server.MemoryBucketStore(100))
+    monkeypatch.setattr(server, "registration_ingest", server.RegistrationBatcher("registration ingest", 10, 0.001))
+
+    async def scenario():
+        writer = asyncio.create_task(server.registration_ingest.run())
+        try:
+            await sign_up("a@example.com")
+            with pytest.raises(HTTPException) as exc:
+                await sign_up("a@example.com", "Someone Else")
+            return exc.value
+        finally:
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+
+    error = asyncio.run(scenario())
+    assert (error.status_code, error.detail) == (400, "Email already registered")
+    assert asyncio.run(db.registrations.count_documents({})) == 1
+
+
+@pytest.mark.parametrize("details, field", [
+    ({"keyPattern": {"email": 1}, "keyValue": {"email": "a"}}, "email"),
+    ({"keyValue": {"registration_id": "NEU1"}}, "registration_id"),
+    ({"errmsg": "E11000 duplicate key error collection: neuron.registrations index: email_1 dup key: { email: \"a\" }"}, "email"),
+    ({"errmsg": "E11000 Duplicate Key Error, full error: {'keyValue': {'email': 'a'}, 'keyPattern': {'email': 1}}"}, "email"),
+    ({"errmsg": "E11000 duplicate key error"}, None),
+    (None, None),
+])
+def test_duplicate_key_field(details, field):
+    assert server.duplicate_key_field(details) == field
+
+
+def test_startup_fails_without_the_unique_email_index(db):
+    async def scenario():
+        await db.registrations.drop_indexes()
+        await db.registrations.create_index([("email", ASCENDING)], name="email_1")
+        await server.ensure_indexes()
+
+    with pytest.raises(RuntimeError, match="registrations.email_1"):
+        asyncio.run(scenario())
+
+
+def test_startup_fails_when_duplicates_block_the_unique_index(db, registration):
+    async def scenario():
+        await db.registrations.drop_indexes()
+        await db.registrations.insert_many([registration(1), registration(2, email="user1@example.com")])
+        await server.ensure_indexes()
+
+    with pytest.raises(RuntimeError, match="registrations.email_1"):
+        asyncio.run(scenario())
@@ -0,0 +1,33 @@
+import asyncio
+
+import orjson
+import pytest
+from fastapi import Response
+
+import server
+
+
+def first_row(serializer, format):
+    query = server.registration_filters(None, None, None, None, None)
+
+    async def scenario():
+        result = await server.get_registrations(Response(), query, None, None, "desc", None, format, "admin")
+        if format == "json" and serializer == "model":
+            return server.Registration.model_validate(result[0]).model_dump(mode="json")
+        if format == "json":
+            return orjson.loads(result.body)[0]
+        body = b"".join([chunk if isinstance(chunk, bytes) else chunk.encode() async for chunk in result.body_iterator])
+        return orjson.loads(body.splitlines()[0])
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("format", ["json", "ndjson"])
+def test_trusted_rows_carry_only_model_fields(db, registration, monkeypatch, format):
+    monkeypatch.setattr(server, "REGISTRATION_SERIALIZER", "trusted")
+    # Set by payment writes, but not part of Registration.
+    asyncio.run(db.registrations.insert_one({**registration(1), "payment_updated_at": "2026-01-01T00:00:00"}))
+
+    trusted = first_row("trusted", format)
+    monkeypatch.setattr(server, "REGISTRATION_SERIALIZER", "model")
+    assert set(trusted) == set(first_row("model", format))
+    assert "payment_updated_at" not in trusted
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Response
+
+import server
+
+
+def unpaid_pages(limit):
+    pages, cursor = [], None
+    while True:
+        response = Response()
+        teams = asyncio.run(server.get_teams(response, True, cursor, limit, "admin"))
+        pages.append([team["team_key"] for team in teams])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_unpaid_teams_page_in_key_order(db, registration):
+    async def scenario():
+        await db.registrations.insert_many([
+            registration(1, team_name="Delta"),
+            registration(2, team_name="alpha", payment_status=server.PAID_STATUS),
+            registration(3, team_name="Charlie"),
+            registration(4, team_name="bravo"),
+            registration(5, team_name="Echo", payment_status=server.PAID_STATUS),
+        ])
+        await server.refresh_teams()
+    asyncio.run(scenario())
+
+    assert unpaid_pages(2) == [["bravo", "charlie"], ["delta"]]
+
+
+def test_unpaid_index_only_holds_teams_with_unpaid_members():
+    spec = next(m.document for m in server.INDEXES["teams"] if m.document["name"] == "team_key_unpaid")
+    assert list(spec["key"])[0] == "team_key"
+    assert spec["partialFilterExpression"] == {"unpaid_count": {"$gt": 0}}
+
+
+def test_full_refresh_repairs_counts_and_keeps_teams_touched_meanwhile(db, registration):
+    async def scenario():
+        await db.registrations.insert_one(registration(1, team_name="Alpha"))
+        long_ago = datetime.now(timezone.utc) - timedelta(days=1)
+        await db.teams.insert_many([
+            {"team_key": "alpha", "team_name": "Alpha", "member_count": 5, "paid_count": 0, "unpaid_count": 5,
+             "updated_at": long_ago},
+            {"team_key": "gone", "team_name": "Gone", "member_count": 1, "paid_count": 0, "unpaid_count": 1,
+             "updated_at": long_ago},
+            # Counted into by a sign-up while the recount was running.
+            {"team_key": "joined", "team_name": "Joined", "member_count": 1, "paid_count": 0, "unpaid_count": 1,
+             "updated_at": datetime.now(timezone.utc) + timedelta(minutes=1)},
+        ])
+        await server.refresh_teams()
+        return {team["team_key"]: team["member_count"] for team in await db.teams.find().to_list(None)}
+
+    assert asyncio.run(scenario()) == {"alpha": 1, "joined": 1}
@@ -322,7 +322,9 @@ class NeuronAPITester:
         return self.tests_passed == self.tests_run
 
 def main():
-    tester = NeuronAPITester()
+    # Pass a base URL to run against a local server, e.g. http://127.0.0.1:8001.
+    # For latency numbers use backend/benchmarks/load_test.py instead.
+    tester = NeuronAPITester(sys.argv[1]) if len(sys.argv) > 1 else NeuronAPITester()
     success = tester.run_all_tests()
     
     # Save detailed results
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { useNavigate } from 'react-router-dom';
 import { Button } from '@/components/ui/button';
@@ -14,6 +14,9 @@ export default function AdminDashboard() {
   const [registrations, setRegistrations] = useState([]);
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
+  // The live payment handler reads the current list without re-subscribing.
+  const registrationsRef = useRef(registrations);
+  registrationsRef.current = registrations;
 
 const fetchData = useCallback(async () => {
   const token = localStorage.getItem("admin_token");
@@ -21,7 +24,10 @@ const fetchData = useCallback(async () => {
 
   try {
     const [regsResponse, statsResponse] = await Promise.all([
-      axios.get(`${API}/registrations`, { headers }),
+      axios.get(`${API}/registrations`, {
+        headers,
+        params: { fields: 'registration_id,full_name,email,college,team_name,payment_status,order_id' },
+      }),
       axios.get(`${API}/registrations/stats`, { headers }),
     ]);
 
@@ -51,6 +57,86 @@ useEffect(() => {
 
   fetchData();
 }, [fetchData, navigate]);
+
+// Live updates: prepend new sign-ups and patch payment status in place
+// instead of re-fetching the whole list.
+useEffect(() => {
+  const token = localStorage.getItem("admin_token");
+  if (!token) return;
+
+  let source = null;
+  let retry = null;
+  let closed = false;
+
+  // EventSource can't send the bearer header, and a token in the URL would
+  // end up in access logs, so every connection uses a single-use ticket.
+  const connect = async () => {
+    try {
+      const { data } = await axios.post(`${API}/registrations/events/ticket`, null, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (closed) return;
+      source = new EventSource(`${API}/registrations/events?ticket=${encodeURIComponent(data.ticket)}`);
+    } catch (error) {
+      if (!closed && error.response?.status !== 401) retry = setTimeout(connect, 5000);
+      return;
+    }
+
+    source.addEventListener("registration", (event) => {
+      const reg = JSON.parse(event.data);
+      setRegistrations((prev) => [reg, ...prev]);
+      setStats((prev) => prev && {
+        ...prev,
+        total_registrations: prev.total_registrations + 1,
+        pending_registrations: prev.pending_registrations + 1,
+      });
+    });
+
+    source.addEventListener("payment", (event) => {
+      const update = JSON.parse(event.data);
+      // Match on registration_id when the event has one; order_id is only a
+      // fallback, and never when null (every order-less row would match).
+      const matches = (reg) => update.registration_id
+        ? reg.registration_id === update.registration_id
+        : update.order_id != null && reg.order_id === update.order_id;
+      const previous = update.previous_status
+        ?? registrationsRef.current.find(matches)?.payment_status;
+      setRegistrations((prev) => prev.map((reg) =>
+        matches(reg) ? { ...reg, payment_status: update.payment_status } : reg
+      ));
+
+      // Without a previous status (change stream, row not on this page) the
+      // delta is unknown, so the cached server stats are fetched instead.
+      if (!previous) {
+        axios.get(`${API}/registrations/stats`, { headers: { Authorization: `Bearer ${token}` } })
+          .then((response) => setStats(response.data))
+          .catch((error) => console.error("Stats refresh error:", error));
+        return;
+      }
+      const delta = (status) => (update.payment_status === status) - (previous === status);
+      setStats((prev) => prev && {
+        ...prev,
+        paid_registrations: prev.paid_registrations + delta('completed'),
+        pending_registrations: prev.pending_registrations + delta('pending'),
+        total_revenue_inr: prev.total_revenue_inr + delta('completed') * (update.amount || 0) / 100,
+      });
+    });
+
+    // The ticket is spent, so a dropped stream reconnects with a fresh one
+    // instead of letting EventSource retry the same URL.
+    source.onerror = () => {
+      source.close();
+      if (!closed) retry = setTimeout(connect, 5000);
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    if (source) source.close();
+  };
+}, []);
   
   const handleExport = async () => {
     const token = localStorage.getItem('admin_token');
@@ -78,6 +164,11 @@ useEffect(() => {
   };
   
   const handleLogout = () => {
+    const token = localStorage.getItem('admin_token');
+    // Revoke server-side too; the local logout doesn't wait on it.
+    axios.post(`${API}/auth/logout`, null, {
+      headers: { Authorization: `Bearer ${token}` }
+    }).catch(() => {});
     localStorage.removeItem('admin_token');
     toast.success('Logged out successfully');
     navigate('/admin');
@@ -49,6 +49,11 @@ export default function Register() {
         return;
       }
       
+      // One key per payment attempt: a resent request within this attempt
+      // gets the same order back, while a later attempt is checked afresh
+      // (and refused once the registration is paid).
+      const attemptId = window.crypto?.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
       // Create payment order
       const orderResponse = await axios.post(`${API}/payment/create-order`, {
         amount: 50000, // 500 INR in paise
@@ -56,6 +61,8 @@ export default function Register() {
         full_name: formData.full_name,
         email: formData.email,
         phone: formData.phone
+      }, {
+        headers: { 'Idempotency-Key': `order-${registrationId}-${attemptId}` }
       });
       
       const { order_id, amount, currency, key_id } = orderResponse.data;